@@ -1,30 +1,33 @@
-import os
+import uuid
 import streamlit as st
 import pandas as pd
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
-from reportlab.lib.pagesizes import letter, landscape, A3
-from reportlab.platypus import Image
-from reportlab.pdfgen import canvas
-from datetime import datetime
-from io import BytesIO
-from reportlab.lib.units import inch, mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, KeepTogether
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.pdfbase.pdfmetrics import stringWidth
-from reportlab.lib.enums import TA_CENTER
+from functools import partial
+from dataclasses import asdict
 
-# Set custom favicon and page title
-st.set_page_config(page_title="Merge table Web App", page_icon="path/logo.jpg")
+from artifacts import artifact_key, pdf_key, view_key
+from data_manager import data_manager
+from diagnostics import DIAGNOSTICS, Trace
+from disk_engine import DISK_ENGINE, DiskFeed, open_dataset
+from filter_engine import filter_index, filter_positions
+from grid_view import GRID_PAGE_SIZE, ROW_ID, GridFeed, edit_log, rows_to_frame, window_label
+from exports import EXPORT_FORMATS, export_bytes
+from merge_engine import merge_uploads, prepare_uploads
+from pdf_layout import column_measurements, header_names, plan_layout
+from pdf_jobs import DONE, FAILED, QUEUED, RUNNING, get_job, queue_position, submit_export
+from pdf_report import RENDER_WORKERS, ReportOptions
 
+# Seconds between refreshes of the export list while exports are running
+EXPORT_POLL_SECONDS = 1
 
-def split_into_chunks(lst, n):
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
+# Rows of the merged frame shown above the filters; the full frame is browsed in the grid
+PREVIEW_ROWS = 10
+
+NO_COLUMNS_FIT = "No columns fit on the page; please reduce the column sizes or the font size."
+
+# Set custom favicon and page title
+st.set_page_config(page_title="Merge table Web App", page_icon="path/logo.jpg")
 
-def max_total_characters(series):
-    return series.fillna('').astype(str).apply(len).max()
 
 # Custom CSS to hide Streamlit components
 hide_streamlit_style = """
@@ -38,159 +41,348 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 if 'page' not in st.session_state:
     st.session_state.page = 'home'  # Initial page
-if 'filtered_df' not in st.session_state:
-    st.session_state.filtered_df = None  # To store filtered DataFrame
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # Owner of this session's data in the data manager
 if 'column_headers' not in st.session_state:
     st.session_state.column_headers = None  # To store column headers
 if 'column_order' not in st.session_state:
     st.session_state.column_order = None  # To store column order
+if 'pdf_jobs' not in st.session_state:
+    st.session_state.pdf_jobs = []  # IDs of this session's PDF exports
+
+# Frames are held by the process-wide data manager (shared by content hash, evicted when idle),
+# not by the session state, so an idle session holds no data of its own
+data_manager.enter_session(st.session_state.session_id)
+
+# Stage timings and counters of this run, for the diagnostics panel and the JSON log
+run_trace = Trace('rerun', enabled=DIAGNOSTICS or st.session_state.get('show_diagnostics', False))
+
+def show_export_jobs(polling):
+    """Progress, cancel and download controls for this session's PDF exports."""
+    jobs = [job for job in map(get_job, st.session_state.pdf_jobs) if job is not None]
+    for job in jobs:
+        label = f"Export {job.id}"
+        if job.status == QUEUED:
+            st.progress(0.0, text=f"{label}: queued, {queue_position(job)} export(s) ahead")
+        elif job.status == RUNNING:
+            st.progress(min(job.pages_done / max(job.pages_total, 1), 1.0),
+                        text=f"{label}: {job.pages_done}/{job.pages_total} pages rendered")
+        elif job.status == DONE and job.available:
+            # The PDF is read from the artifact store only when the button is clicked
+            st.download_button(
+                label="Download the generated PDF",
+                data=job.pdf,
+                file_name=job.filename,
+                mime='application/pdf',
+                key=f"download_{job.id}"
+            )
+        elif job.status == DONE:
+            st.warning(f"{label}: the PDF is no longer stored; please generate it again.")
+        elif job.status == FAILED:
+            st.error(f"{label} failed: {job.error}")
+        else:
+            st.info(f"{label} was cancelled.")
+        if job.active:
+            st.button("Cancel", key=f"cancel_{job.id}", on_click=job.cancel)
+    # Stop polling (and show the results outside the fragment) once every export has finished
+    if polling and not any(job.active for job in jobs):
+        st.rerun()
+
+
+def export_jobs_panel():
+    jobs = [job for job in map(get_job, st.session_state.pdf_jobs) if job is not None]
+    st.session_state.pdf_jobs = [job.id for job in jobs]
+    if jobs:
+        polling = any(job.active for job in jobs)
+        # Refresh just this panel while exports are queued or running
+        st.fragment(show_export_jobs, run_every=EXPORT_POLL_SECONDS if polling else None)(polling)
+
+
+def diagnostics_panel(trace):
+    """Sidebar panel with the stage timings of this run and of this session's exports."""
+    st.sidebar.checkbox("Show diagnostics", key='show_diagnostics')
+    if not st.session_state.show_diagnostics:
+        return
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        # Memory held for all sessions of this server process
+        usage = data_manager.usage()
+        st.markdown(f"**Data manager**: {usage.message()}")
+        st.json(asdict(usage), expanded=False)
+        traces = [trace] + [job.trace for job in map(get_job, st.session_state.pdf_jobs)
+                            if job is not None and job.trace.seconds is not None]
+        for shown in traces:
+            summary = shown.as_dict()
+            title = shown.name if 'job' not in summary else f"{shown.name} {summary['job']}"
+            st.markdown(f"**{title}**: {summary['seconds'] or 0:.3f}s, peak RSS {summary['peak_rss_mb']:.0f} MB")
+            if summary['stages']:
+                st.dataframe(pd.DataFrame(summary['stages']), hide_index=True)
+            if summary['counters']:
+                st.json(summary['counters'], expanded=False)
+
+
+def download_buttons(export_df, export_view):
+    """A download button per export format; each file is written in chunks only when its button is clicked."""
+    for column, (fmt, export_format) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        column.download_button(
+            label=f"Download {export_format.label}",
+            data=partial(export_bytes, export_df, fmt, artifact_key(fmt, export_view)),
+            file_name=f'filtered_data.{export_format.extension}',
+            mime=export_format.mime,
+            key=f"download_{fmt}"
+        )
+
+
+def pdf_form():
+    """The PDF export inputs; returns the ``ReportOptions`` when Generate PDF is clicked, else None."""
+    title = st.text_input("Please input a title for the PDF:")
+    confidential = st.text_input("Please input a confidential note for the PDF:", value="Confidential")
+    team = st.text_input("Please input create date for the PDF:")
+    confirm = st.text_input("Please input confirmed by for the PDF: ")
+    signature_data = st.text_input("Please input signature data for the PDF:")
+    row_page = st.number_input("Please input a number of rows per page:", min_value=1, value=9)
+    fontsize = st.number_input("Please input a font size of table for the PDF: ",min_value=0.1, value=8.0)
+    col_size = st.number_input("Please input a size of columns per page:", min_value=1, value=80,
+                               help="Narrowest column; columns widen to fit their content.")
+    b_col_size = st.number_input("Please input a size of big columns per page:", min_value=1, value=300,
+                                 help="Widest column; longer text wraps.")
+    last_col_size = st.number_input("Please input a size of last columns per page:", min_value=1, value=80,
+                                    help="Narrowest column on the last column page.")
+    note1 = st.text_area("Please input the content note (use '-' to separate paragraphs):", height=200)
+    streaming = st.checkbox("Render pages one at a time (low memory)", value=True)
+    render_workers = st.number_input("Please input a number of processes to render the PDF with:",
+                                     min_value=1, max_value=RENDER_WORKERS, value=1)
+    if note1.strip() == "":
+        st.warning("The text area cannot be empty!")
+        button_disabled = True
+    else:
+        button_disabled = False
+
+    if not st.button("Generate PDF",disabled=button_disabled):
+        return None
+
+    # Logo
+    logo_path = 'path/logo.jpg'  # logo location
+
+    return ReportOptions(title=title, confidential=confidential, team=team, confirm=confirm,
+                         signature_data=signature_data, note=note1, row_page=row_page,
+                         fontsize=fontsize, col_size=col_size, b_col_size=b_col_size,
+                         last_col_size=last_col_size, logo_path=logo_path,
+                         streaming=streaming, workers=render_workers)
+
+
+def disk_page(uploaded_files):
+    """Merge, filter and export with the disk-backed engine (``disk_engine``), for inputs too large for memory.
+
+    The uploads are joined and filtered in a SQLite database and only the
+    rows shown or exported are read back, a window or a chunk at a time. The
+    grid is read-only: edits need the rows in memory.
+    """
+    files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    run_trace.count(files=len(files), input_bytes=sum(len(data) for _, data in files), engine='disk')
+    try:
+        with run_trace.stage('merge'):
+            dataset, messages = open_dataset([data for _, data in files], [name for name, _ in files])
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+    run_trace.count(rows=dataset.n_rows, columns=len(dataset.columns))
+    for message in messages:
+        st.warning(message)
+    if len(files) > 1:
+        key_column = dataset.columns[0]
+        for report in dataset.reports:
+            if report.skipped:
+                st.error(report.message(key_column))
+        with st.expander("Merge report"):
+            for report in dataset.reports:
+                st.write(report.message(key_column))
+
+    st.sidebar.image("path/logo.jpg", use_container_width=True)  # For sidebar
+
+    # Filter options
+    st.sidebar.header("Filter Options")
+    filter_columns = st.sidebar.multiselect("Filter columns", dataset.columns,
+                                            default=['filter'] if 'filter' in dataset.columns else [])
+    predicates = {}
+    for column in filter_columns:
+        column_index = dataset.column(column)
+        if column_index.is_range:
+            min_value, max_value = column_index.min, column_index.max
+            predicates[column] = st.sidebar.slider(f"Filter {column} range:", min_value, max_value, (min_value, max_value))
+        else:
+            # No selection means all values
+            predicates[column] = st.sidebar.multiselect(f"Filter by {column}", options=column_index.categories)
+
+    # The sub-header row is always kept
+    with run_trace.stage('filter'):
+        view = dataset.select(predicates)
+        # The session's previous selection is dropped from the database once it is replaced
+        previous = st.session_state.get('disk_selection')
+        if previous is not None and previous != (dataset.key, view.table) and previous[0] == dataset.key:
+            dataset.drop_selection(previous[1])
+        st.session_state.disk_selection = (dataset.key, view.table)
+    run_trace.count(filtered_rows=len(view))
+
+    st.sidebar.header("Select Columns to Display")
+    selected_columns = st.sidebar.multiselect("Choose columns to display", dataset.columns,
+                                              default=dataset.columns, key='disk_columns')
+    if not selected_columns:
+        st.write("Please select at least one column to display.")
+        return
+    view = view.with_columns(selected_columns)
+
+    st.write("### Filtered Data")
+    feed = DiskFeed(view)
+    sort_col, order_col, window_col = st.columns(3)
+    sort_by = sort_col.selectbox("Sort by", ['(none)'] + selected_columns)
+    descending = order_col.checkbox("Descending")
+    window = window_col.number_input("Rows window", min_value=1, max_value=feed.n_windows, value=1) - 1
+    sort_by = None if sort_by == '(none)' else sort_by
+    with run_trace.stage('grid'):
+        window_df = feed.window(selected_columns, window, sort_by, not descending)
+        st.caption(window_label(feed, window))
+        gb = GridOptionsBuilder.from_dataframe(window_df)
+        gb.configure_default_column(editable=False, sortable=False, resizable=True, hide=False)
+        gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=GRID_PAGE_SIZE)
+        gb.configure_grid_options(domLayout='normal')
+        gb.configure_side_bar()
+        AgGrid(window_df, gridOptions=gb.build(), enable_enterprise_modules=False, height=500, width='100%',
+               theme="alpine", update_mode=GridUpdateMode.NO_UPDATE)
+    run_trace.count(grid_rows=len(window_df))
+
+    export_view = view_key(dataset.key, predicates, [], selected_columns)
+    download_buttons(view, export_view)
+
+    report_options = pdf_form()
+    if report_options is not None:
+        header = header_names(selected_columns)
+        # Column widths are measured on rows sampled across the dataset
+        with run_trace.stage('layout'):
+            measures = column_measurements(dataset.key, dataset.sample(), report_options.fontsize)
+            column_pages = plan_layout(view, measures, report_options.col_size, report_options.b_col_size,
+                                       report_options.last_col_size)
+        run_trace.count(column_pages=len(column_pages))
+        if not any(page.columns for page in column_pages):
+            st.warning(NO_COLUMNS_FIT)
+        else:
+            # Rendered in one pass over the view's chunks
+            job = submit_export(view, header, column_pages, report_options, "output.pdf",
+                                pdf_key(export_view, report_options), diagnostics=run_trace.enabled)
+            st.session_state.pdf_jobs.append(job.id)
 
-counter = 1
-
-def insert_column(merged_df, position):
-    global counter
-    new_column_name = f"id{counter}_0"
-    new_column_name2 = f"column_{counter}_1"
-    new_column_name3 = f"column_{counter}_2"
-    merged_df.insert(position, new_column_name3, merged_df.iloc[:, 2])
-    merged_df.insert(position, new_column_name2, merged_df.iloc[:, 1])
-    merged_df.insert(position, new_column_name, merged_df.iloc[:, 0])
-    counter += 1
-
-
-def add_page_number_with_header(canvas, _, team, image_path,confidential, title):
-    page_num = canvas.getPageNumber()
-    text = f"Page {page_num}"
-    canvas.setFont("Helvetica", 12)
-    width, _ = A3  # A3 page size
-
-    # Header image position (top of the page)
-    image_x = 20  # 20 units from the left margin
-    image_y = 750  # 60 units from the top margin
-    image_width = 150  # Image width
-    image_height = 100  # Image height
-
-    # Draw the header image
-    canvas.drawImage(image_path, image_x, image_y, width=image_width, height=image_height)
-
-    canvas.drawString(1050, 800, confidential)
-
-    canvas.setFont("Helvetica-Bold", 16)
-    canvas.drawCentredString((width / 2)+170, 770, title)
-
-    # Team text position (on the right side)
-    team_text_width = stringWidth(team, "Helvetica", 9)
-    team_x = width + 230 - team_text_width  # Right margin padding of 10
-    team_y = 50  # Adjust y-position for team text
-
-    # Draw the team text
-    canvas.setFont("Helvetica", 12)
-    canvas.drawString(team_x, team_y, team)
+    export_jobs_panel()
 
-    # Draw the page number text
-    canvas.drawCentredString((width / 2) + 200, 20, text)
 
 def home_page():
     st.title("Merge and Convert file from excel to PDF")
 
-    uploaded_dfs = []
-    if 'uploaded_dfs' not in st.session_state:
-        st.session_state.uploaded_dfs = []
+    uploads = []
+    uploaded_names = []
+    uploaded_keys = []
+    uploaded_data = []
     # Upload files
     uploaded_files = st.file_uploader("Upload your CSV or Excel files", type=['csv', 'xlsm', 'xlsx'], accept_multiple_files=True)
 
-    if uploaded_files:
-        st.session_state.uploaded_dfs = []
-        for uploaded_file in uploaded_files:
-            # Read data based on file type
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
+    if uploaded_files and st.sidebar.checkbox("Disk-backed engine (large inputs)", value=DISK_ENGINE,
+                                              help="Merge and filter in a database on disk instead of in memory."):
+        disk_page(uploaded_files)
+    elif uploaded_files:
+        # Read data based on file type (each file converted to compact types and indexed once, cached on
+        # its content across reruns; only files not prepared yet are parsed, in parallel)
+        files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+        run_trace.count(files=len(files), input_bytes=sum(len(data) for _, data in files))
+        with run_trace.stage('parse'):
+            prepared, prepared_keys = prepare_uploads(files)
+        for file, upload, key in zip(files, prepared, prepared_keys):
+            if upload.df.empty:
+                st.warning(f"The file {file[0]} is empty.")
             else:
-                df = pd.read_excel(uploaded_file)
-
-            if df.empty:
-                st.warning(f"The file {uploaded_file.name} is empty.")
-            else:
-                uploaded_dfs.append(df)
-        # Merge files if more than one
-        if len(uploaded_dfs) > 1:
-            # Start with the first DataFrame
-            merged_df = uploaded_dfs[0]
+                uploads.append(upload)
+                uploaded_names.append(file[0])
+                uploaded_keys.append(key)
+                uploaded_data.append(file)
+        if not uploads:
+            return
+        # Merge files if more than one (joined on the first column of the first one in a single pass),
+        # so adding or removing a file re-joins cached pieces only
+        with run_trace.stage('merge'):
+            merged_df, dataset_key, join_reports, column_usage = merge_uploads(uploads, uploaded_names,
+                                                                               uploaded_keys, uploaded_data)
+        run_trace.count(rows=len(merged_df), columns=merged_df.shape[1], data_mb=round(column_usage.after_bytes / 1e6, 1),
+                        saved_mb=round(column_usage.saved_bytes / 1e6, 1))
+        if len(uploads) > 1:
             key_column = merged_df.columns[0]
-
-            # Ensure the key column is string in the first DataFrame
-            merged_df[key_column] = merged_df[key_column].astype(str)
-
-            # Iteratively merge the DataFrames
-            for df in uploaded_dfs[1:]:
-                # Ensure the key column exists and is of string type in the current DataFrame
-                if key_column not in df.columns:
-                    st.error(f"Key column '{key_column}' not found in one of the uploaded files.")
-                    continue
-
-                df[key_column] = df[key_column].astype(str)
-
-                # Merge the DataFrames
-                merged_df = pd.merge(merged_df, df, on=key_column, how="inner", validate="1:1")
-
-            # Replace 'nan' with empty strings and clean numeric strings
-            merged_df = merged_df.replace('nan', '')
-            merged_df.iloc[:, 0] = merged_df.iloc[:, 0].astype(str).str.replace(r'\.0$', '', regex=True)
+            for report in join_reports:
+                if report.skipped:
+                    st.error(report.message(key_column))
+            with st.expander("Merge report"):
+                for report in join_reports:
+                    st.write(report.message(key_column))
 
             # Display the merged DataFrame
             st.write("### Merged Data")
-            st.write(merged_df)
+            st.write(merged_df.head(PREVIEW_ROWS))
         else:
-            # Single DataFrame case
-            merged_df = uploaded_dfs[0].astype(str)
-            merged_df = merged_df.replace('nan', '')
-            merged_df.iloc[:, 0] = merged_df.iloc[:, 0].astype(str).str.replace(r'\.0$', '', regex=True)
-
             # Display the uploaded DataFrame
             st.write("### Uploaded Data")
-            st.write(merged_df)
+            st.write(merged_df.head(PREVIEW_ROWS))
+        st.caption(column_usage.message())
 
         st.sidebar.image("path/logo.jpg", use_container_width=True)  # For sidebar
 
         # Filter options
         st.sidebar.header("Filter Options")
 
-        # Dynamic filters
-        column = 'filter'
-
-        # Filtering logic for a specific column
-        if merged_df[column].dtype == 'object':
-            filter_value = st.sidebar.selectbox(f"Filter by {column}",
-                                                options=['All'] + merged_df[column].unique().tolist())
-            filtered_df = merged_df[merged_df[column] == filter_value] if filter_value != 'All' else merged_df
-        else:
-            min_value, max_value = float(merged_df[column].min()), float(merged_df[column].max())
-            filter_range = st.sidebar.slider(f"Filter {column} range:", min_value, max_value, (min_value, max_value))
-            filtered_df = merged_df[(merged_df[column] >= filter_range[0]) & (merged_df[column] <= filter_range[1])]
-
-        # Make sure the first row is always included
-        filtered_df = pd.concat([merged_df.iloc[[0]], filtered_df]).drop_duplicates().reset_index(drop=True)
-
-        # Save the filtered dataframe to session state
-        st.session_state.filtered_df = filtered_df
-
-        if 'r' not in st.session_state or 'filtered_df' not in st.session_state:
+        # Dynamic filters: the 'filter' column by default, any other column on request
+        filter_columns = st.sidebar.multiselect("Filter columns", merged_df.columns.unique().tolist(),
+                                                default=['filter'] if 'filter' in merged_df.columns else [])
+
+        # Column indexes are built once per dataset and reused across reruns
+        index = filter_index(dataset_key, merged_df)
+        predicates = {}
+        for column in filter_columns:
+            column_index = index.column(column)
+            if column_index.is_range:
+                min_value, max_value = column_index.min, column_index.max
+                predicates[column] = st.sidebar.slider(f"Filter {column} range:", min_value, max_value, (min_value, max_value))
+            else:
+                # No selection means all values
+                predicates[column] = st.sidebar.multiselect(f"Filter by {column}", options=column_index.categories)
+
+        # The filtered rows with this session's grid edits, shared with every session showing the same view
+        grid_edits = edit_log(st.session_state, dataset_key)
+        filtered_key = view_key(dataset_key, predicates, grid_edits.edits, merged_df.columns)
+
+        # Make sure the first row is always included (kept by position, not by de-duplicating rows)
+        with run_trace.stage('filter'):
+            filtered_positions = filter_positions(index, predicates)
+            filtered_df = data_manager.get(filtered_key)
+            if filtered_df is None:
+                filtered_df = merged_df.take(filtered_positions).reset_index(drop=True)
+                # Replay this session's grid edits onto the freshly filtered rows
+                grid_edits.apply(filtered_df, filtered_positions)
+                data_manager.put(filtered_key, filtered_df, spill=True)
+            # This run's own frame object: edits replace its columns, not the shared ones
+            filtered_df = filtered_df.copy(deep=False)
+        run_trace.count(filtered_rows=len(filtered_df))
+
+        if 'r' not in st.session_state:
             st.session_state.r = 0
             st.session_state.column_order = []
 
         if st.session_state.column_order == [] or set(st.session_state.column_order) - set(
-                st.session_state.filtered_df.columns):
-            st.session_state.column_order = st.session_state.filtered_df.columns.tolist()
+                filtered_df.columns):
+            st.session_state.column_order = filtered_df.columns.tolist()
 
         if st.session_state.r == 0:
-            st.session_state.column_order = st.session_state.filtered_df.columns.tolist()
+            st.session_state.column_order = filtered_df.columns.tolist()
             st.session_state.r = 1
 
         st.sidebar.header("Select Columns to Display")
         with st.sidebar.form(key="column_selection_form"):
             selected_columns = st.multiselect(
                 "Choose columns to display",
-                st.session_state.filtered_df.columns.tolist(),
+                filtered_df.columns.tolist(),
                 default=st.session_state.column_order
             )
             submitted = st.form_submit_button("Apply")
@@ -203,409 +395,95 @@ def home_page():
         reset_columns = st.sidebar.button("Reset Columns to Default")
 
         if reset_columns:
-            st.session_state.column_order = st.session_state.filtered_df.columns.tolist()
+            st.session_state.column_order = filtered_df.columns.tolist()
             st.rerun()
 
 
         # Display filtered data
         st.write("### Filtered Data")
         if selected_columns:
-            filtered_df_to_display = st.session_state.filtered_df[selected_columns]
-
-            # Display using st_aggrid
-            gb = GridOptionsBuilder.from_dataframe(filtered_df_to_display)
-            gb.configure_default_column(editable=True, sortable=True, resizable=True, hide=False)
-            gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=20)
-            gb.configure_grid_options(domLayout='normal')
-            gb.configure_side_bar()
-            grid_options = gb.build()
-
-            response = AgGrid(
-                filtered_df_to_display,
-                gridOptions=grid_options,
-                enable_enterprise_modules=False,
-                height=500,
-                width='100%',
-                theme="alpine",
-                update_mode=GridUpdateMode.MODEL_CHANGED,
-                allow_unsafe_jscode=True
-            )
-
-            # Update session_state DataFrame and column order
-            if response['data'] is not None:
-                st.session_state.filtered_df = pd.DataFrame(response['data'])
+            # Only a window of rows is sent to the browser; sorting and paging happen here
+            feed = GridFeed(filtered_key, filtered_df)
+            sort_col, order_col, window_col = st.columns(3)
+            sort_by = sort_col.selectbox("Sort by", ['(none)'] + selected_columns)
+            descending = order_col.checkbox("Descending")
+            window = window_col.number_input("Rows window", min_value=1, max_value=feed.n_windows, value=1) - 1
+            sort_by = None if sort_by == '(none)' else sort_by
+            with run_trace.stage('grid'):
+                filtered_df_to_display = feed.window(selected_columns, window, sort_by, not descending)
+                st.caption(window_label(feed, window))
+
+                # Display using st_aggrid
+                gb = GridOptionsBuilder.from_dataframe(filtered_df_to_display)
+                gb.configure_default_column(editable=True, sortable=False, resizable=True, hide=False)
+                gb.configure_column(ROW_ID, hide=True, editable=False)
+                gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=GRID_PAGE_SIZE)
+                gb.configure_grid_options(domLayout='normal')
+                gb.configure_side_bar()
+                grid_options = gb.build()
+
+                response = AgGrid(
+                    filtered_df_to_display,
+                    gridOptions=grid_options,
+                    enable_enterprise_modules=False,
+                    height=500,
+                    width='100%',
+                    theme="alpine",
+                    update_mode=GridUpdateMode.MODEL_CHANGED,
+                    allow_unsafe_jscode=True
+                )
+            run_trace.count(grid_rows=len(filtered_df_to_display))
+
+            # Record cell edits made in the window and apply them to the full frame
+            new_edits = grid_edits.record(filtered_df, filtered_positions, rows_to_frame(response['data']))
+            if new_edits:
+                # Held under the new edits, so the next rerun does not replay them. The frame held under
+                # the previous edits is superseded and dropped, unless another session is showing it
+                data_manager.release(filtered_key)
+                data_manager.put(view_key(dataset_key, predicates, grid_edits.edits, merged_df.columns),
+                                 filtered_df.copy(deep=False), spill=True)
+
+            # Update the filtered DataFrame and column order
+            filtered_df = filtered_df[selected_columns]
             if 'columnState' in response and response['columnState']:
-                reordered_columns = [col['colId'] for col in response['columnState'] if 'colId' in col]
-                st.session_state.filtered_df = st.session_state.filtered_df[reordered_columns]
+                reordered_columns = [col['colId'] for col in response['columnState']
+                                     if 'colId' in col and col['colId'] != ROW_ID]
+                filtered_df = filtered_df[reordered_columns]
                 st.session_state.column_order = reordered_columns
 
-            # Download CSV
-            # DataFrame
-            df = st.session_state.filtered_df
-
-            df = df.fillna(" ")
-
-            df.columns = [col if "Unnamed" not in col else " " for col in df.columns]
+            # Exports are stored under the uploads' content hash, filters, edits and columns
+            export_view = view_key(dataset_key, predicates, grid_edits.edits, filtered_df.columns)
 
-            csv_data = df.to_csv(index=False)
-
-            st.download_button(
-                label="Download CSV",
-                data=csv_data,
-                file_name='filtered_data.csv',
-                mime='text/csv'
-            )
+            # Downloads: each file is written in chunks only when its button is clicked
+            download_buttons(filtered_df, export_view)
 
             # Export to PDF
-            title = st.text_input("Please input a title for the PDF:")
-            confidential = st.text_input("Please input a confidential note for the PDF:", value="Confidential")
-            team = st.text_input("Please input create date for the PDF:")
-            confirm = st.text_input("Please input confirmed by for the PDF: ")
-            signature_data = st.text_input("Please input signature data for the PDF:")
-            row_page = st.number_input("Please input a number of rows per page:", min_value=1, value=9)
-            fontsize = st.number_input("Please input a font size of table for the PDF: ",min_value=0.1, value=8.0)
-            col_size = st.number_input("Please input a size of columns per page:", min_value=1, value=80)
-            b_col_size = st.number_input("Please input a size of big columns per page:", min_value=1, value=300)
-            last_col_size = st.number_input("Please input a size of last columns per page:", min_value=1, value=80)
-            note1 = st.text_area("Please input the content note (use '-' to separate paragraphs):", height=200)
-            if note1.strip() == "":
-                st.warning("The text area cannot be empty!")
-                button_disabled = True
-            else:
-                button_disabled = False
-
-            if st.button("Generate PDF",disabled=button_disabled):
+            report_options = pdf_form()
+            if report_options is not None:
                 # output pdf
                 pdf_filename = "output.pdf"
 
-                # Create a BytesIO buffer to save the PDF to memory instead of disk
-                buffer = BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=landscape(A3), leftMargin=0 * inch,
-                                        rightMargin=0 * inch, topMargin=1.2 * inch, bottomMargin= 0.8* inch)
-
-                # create story
-                story = []
-                styles = getSampleStyleSheet()
-
-                # Logo
-                logo_path = 'path/logo.jpg'  # logo location
-
-                new_columns = []
-
-                for i, col in enumerate(st.session_state.filtered_df.columns):
-                    if 'Unnamed' in col and i > 0:
-                        new_columns.append(new_columns[i - 1])
-                    elif 'Others' in col:
-                        new_columns.append('Others')
-                    else:
-                        new_columns.append(col)
-
-                st.session_state.filtered_df.columns = new_columns
-
-                new_header = st.session_state.filtered_df.columns.tolist()
-                st.session_state.filtered_df.loc[-1] = new_header
-                st.session_state.filtered_df.index = st.session_state.filtered_df.index.astype(int) + 1
-
-                st.session_state.filtered_df = st.session_state.filtered_df.sort_index()  # sorts the index
-
-                # Define margins and usable width
-                left_margin = 0.4 * inch
-                right_margin = 0.4 * inch
-                usable_width = landscape(A3)[0] - left_margin - right_margin  # Total width minus margins
-
-                long_text_cols = []
-
-                for col_idx in range(st.session_state.filtered_df.shape[1]):
-                    cell_values = st.session_state.filtered_df.iloc[2:5, col_idx]
-
-                    if any(len(str(value)) > 45 for value in cell_values):
-                        long_text_cols.append(col_idx)
-
-                col_widths = []
-
-                print(long_text_cols)
-
-                if not long_text_cols:
-                    long_text_cols.append(-1)
-
-                print(long_text_cols)
-
-                for idx, col in enumerate(st.session_state.filtered_df.columns):
-                    if idx in [0, 1, 2]:
-                        len_num = 70
-                    elif idx == 3:
-                        len_num = 120
-                    elif idx == long_text_cols or idx in long_text_cols:
-                        len_num = b_col_size
-                    else:
-                        len_num = col_size
-                    col_widths.append(len_num)
-
-                print(col_widths)
-                # Check if col_widths is empty
-                if not col_widths:
-                    print("Column widths are empty.")
-                    return None  # Early return if column widths are not determined
-
-                # Initialize variables
-                total_col_width = 0  # To track the total width of columns on the current page
-                max_cols_per_page = 0  # To count the maximum columns per page
-                p = 0  # Counter for pages
-                max1 = []  # List to store the maximum number of columns per page
-
-                p1 = []
-                # Iterate through column widths
-                for width in col_widths:
-                    total_col_width += width  # Add the current column width to the total
-
-                    # Check if the total width is within the usable width
-                    if total_col_width <= usable_width:
-                        max_cols_per_page += 1  # Increment the count of columns on the current page
-                        p += 1  # Increment the page counter
-                    else:
-                        # If the width exceeds usable space, finalize the current page
-                        max1.append(max_cols_per_page)  # Store the count of columns for the current page
-
-                        p1.append(p)
-
-                            # Insert a column for the current page in the DataFrame
-                        insert_column(st.session_state.filtered_df, p)
-
-                            # Prepare for the next page
-                        p += 4  # Increment the page counter by 4
-                        total_col_width = width + sum(col_widths[:3])  # Reset the total column width
-                        max_cols_per_page = 4  # Reset the maximum columns per page
-
-                # Append the last page's column count
-                max1.append(max_cols_per_page)
-
-                data = [[str(item) for item in row] for row in ([
-                                                                    st.session_state.filtered_df.columns.tolist()] + st.session_state.filtered_df.values.tolist())]
-
-                data = data[1:]
-
-                long_text_cols = []
-
-                for col_idx in range(st.session_state.filtered_df.shape[1]):
-                    cell_values = st.session_state.filtered_df.iloc[2:5, col_idx]
-
-                    if any(len(str(value)) > 45 for value in cell_values):
-                        long_text_cols.append(col_idx)
-
-                if not long_text_cols:
-                    long_text_cols.append(-1)
-
-                for idx, col in enumerate(st.session_state.filtered_df.columns):
-                    if idx in p1 or idx in [x + 1 for x in p1] or idx in [x + 2 for x in p1]:
-                        col_widths.insert(idx, 70)
-
-                print(col_widths)
-
-                last_index_of_70 = len(col_widths) - 1 - col_widths[::-1].index(70)
-
-                print(last_index_of_70)
-
-                for i in range(last_index_of_70 + 1, len(col_widths)):
-                    if  i not in long_text_cols:
-                        col_widths[i] = last_col_size
-
-                print(col_widths)
-                if not col_widths:
-                    print("Column widths are empty.")
-                    return None  # Early return if column widths are not determined
+                # Column pages with the key columns repeated; the filtered frame itself is left untouched
+                header = header_names(filtered_df.columns)
+                # Column widths follow the content, measured once per dataset and font size
+                with run_trace.stage('layout'):
+                    measures = column_measurements(dataset_key, merged_df, report_options.fontsize)
+                    column_pages = plan_layout(filtered_df, measures, report_options.col_size,
+                                               report_options.b_col_size, report_options.last_col_size)
+                run_trace.count(column_pages=len(column_pages))
 
                 # Ensure we have columns to display
-                if max_cols_per_page == 0:
-                    print("No columns fit on the page.")
-                    return None  # Early return if no columns can be displayed
-
-                # Define row handling logic as before
-                # Constants and initial setup
-                max_rows_per_page = row_page + 2
-                rows = len(data)
-                num_row_pages = (rows // max_rows_per_page) + 1
-                num_col_pages = len(max1)
-
-                start_row = 0
-
-                # Iterate over row pages
-                for row_page in range(num_row_pages):
-                    # Determine row range for the current page
-                    start_row = 1 if start_row == 0 else end_row - 1
-                    end_row = start_row + max_rows_per_page - 1
-
-                    end_col = 0
-
-                    # Iterate over column pages
-                    for col_page in range(num_col_pages):
-                        # Determine column range for the current page
-                        start_col = end_col
-                        end_col = end_col + max1[col_page]
-
-                        # Prepare page data and create the table
-                        page_data = [row[start_col:end_col] for row in data[start_row + 1:end_row]]
-
-                        # Extract two header rows from data and insert them into page_data
-                        page_data.insert(0, data[0][start_col:end_col])  # Insert the first header row
-                        page_data.insert(1, data[1][start_col:end_col])  # Insert the second header row
-
-                        # Skip if page_data is empty
-                        if not page_data or not page_data[0]:
-                            print("Page data is empty.")
-                            continue
-
-                        style_header = ParagraphStyle(name="HeaderStyle", fontSize=fontsize + 1, leading=fontsize + 4,
-                                                      textColor="white", fontName="Helvetica-Bold",alignment=TA_CENTER)
-                        style_body = ParagraphStyle(name="BodyStyle", fontSize=fontsize, leading=fontsize + 3,
-                                                    textColor="black")
-
-                        # Wrap table data into Paragraphs with conditional styles
-                        wrapped_data = [
-                            [
-                                Paragraph(str(item), style_header if row_idx < 2 else style_body)
-                                for item in row
-                            ]
-                            for row_idx, row in enumerate(page_data)
-                        ]
-
-
-                        # Create table and apply styles
-                        table = Table(wrapped_data, repeatRows=2 ,colWidths=col_widths[start_col:end_col])
-                        table_style = TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 1), colors.red),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('TOPPADDING', (0, 0), (-1, -1), 1 * mm),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 0 * mm),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                        ])
-
-                        col_idx = 0
-                        while col_idx < len(page_data[0]):
-                            start_idx = col_idx
-                            # Find the continuous range of identical column headers in row 0.
-                            while (col_idx + 1 < len(page_data[0]) and page_data[0][col_idx] == page_data[0][col_idx + 1]):
-                                col_idx += 1
-
-                            # If there are identical consecutive column headers, apply merging.
-                            if start_idx != col_idx:
-                                # use SPAN
-                                table_style.add('SPAN', (start_idx, 0), (col_idx, 0))
-                                # Clear the duplicate column headers, keeping only the first one.
-                                for i in range(start_idx + 1, col_idx + 1):
-                                    wrapped_data[0][i] = Paragraph("", style_header)
-
-                            col_idx += 1
-
-                        for col_idx in range(len(page_data[1])):
-                            if page_data[0][col_idx] in ("Other", "Others"):
-                                table_style.add('SPAN', (col_idx, 0), (col_idx, 1))
-                                table_style.add('BACKGROUND', (col_idx, 0), (col_idx, 1), colors.black)
-                            else:
-                                if page_data[1][col_idx] == "":
-                                    # If the value in row 1 is empty, merge row 0 and row 1.
-                                    table_style.add('SPAN', (col_idx, 0), (col_idx, 1))
-                                elif page_data[1][col_idx] in ("Other", "Others"):
-                                    table_style.add('BACKGROUND', (col_idx, 1), (col_idx, 1), colors.black)
-
-                        # use style
-                        table.setStyle(table_style)
-
-                        story.append(KeepTogether([table]))
-
-                        # Add page break if not the last row or column page
-                        if row_page < num_row_pages - 1 or col_page < num_col_pages - 1:
-                            story.append(PageBreak())
-
-                no_gap_style = ParagraphStyle(
-                    'NoGapStyle',
-                    parent=styles['Normal'],
-                    fontSize=12,
-                    leading=14,
-                    spaceBefore=0,
-                    spaceAfter=0,
-                )
-
-                # Left and right content
-
-                left_content = [
-                    Paragraph(f"Confirmed by ({confirm}):", no_gap_style),
-                    Spacer(1, 20),
-                    Paragraph("Signature: ______________________________", no_gap_style),
-                    Spacer(1, 5),
-                    Paragraph(f"Date: {signature_data}", no_gap_style),
-                    Paragraph("Name:", no_gap_style),
-                    Paragraph("Designation:", no_gap_style),
-                ]
-
-
-                note_lines = [line.strip() for line in note1.split('-') if line.strip()]
-                grouped_note_lines = list(split_into_chunks(note_lines, 6))
-
-
-                combined_data = []
-
-                for i, group in enumerate(grouped_note_lines):
-
-                    note_paragraphs = [
-                        Paragraph(f"- {line}" if not (i == 0 and j == 0) else line, no_gap_style)
-                        for j, line in enumerate(group)
-                    ]
-
-
-                    left_column = Table([[line] for line in left_content],
-                                        colWidths=[5 * inch]) if i == 0 else Paragraph("", no_gap_style)
-
-                    row = [
-                        left_column, "",
-                        Table([[line] for line in note_paragraphs], colWidths=[5.5 * inch]),
-                    ]
-                    combined_data.append(row)
-
-                combined_table = Table(combined_data, colWidths=[5 * inch, 5.5 * inch])
-                combined_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                    ('TOPPADDING', (0, 0), (-1, -1), 0),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-                ]))
-
-
-                story.append(Spacer(1, 20))
-                story.append(combined_table)
-
-                # Build the PDF and save to buffer
-                doc.build(story, onFirstPage=lambda canvas, _: add_page_number_with_header(canvas, _, team, logo_path, confidential,title),
-                          onLaterPages=lambda canvas, _: add_page_number_with_header(canvas, _, team, logo_path, confidential, title))
-
-                now = datetime.now()
-                today_date = now.strftime('%Y-%m-%d_%H-%M-%S')
-                milliseconds = now.strftime('%f')[:3]
-                pdf_filename1 = f"{pdf_filename}_{today_date}_{milliseconds}.pdf"
-
-                project_dir = os.path.abspath(os.path.dirname(__file__))
-
-                merge_dir = os.path.join(project_dir, "merge")
-
-                system_pdf_path = os.path.join(merge_dir, pdf_filename1)
-
-                os.makedirs(os.path.dirname(system_pdf_path), exist_ok=True)
-
-                buffer.seek(0)
-                with open(system_pdf_path, 'wb') as f:
-                    f.write(buffer.read())
-
-                # Allow user to download the PDF
-                buffer.seek(0)
-                st.download_button(
-                    label="Download the generated PDF",
-                    data=buffer,
-                    file_name=pdf_filename,
-                    mime='application/pdf'
-                )
+                if not any(page.columns for page in column_pages):
+                    st.warning(NO_COLUMNS_FIT)
+                else:
+                    # Render the tables and the notes in the background (or serve the stored PDF of an
+                    # identical export); the export list below shows progress and offers the download
+                    job = submit_export(filtered_df, header, column_pages, report_options,
+                                        pdf_filename, pdf_key(export_view, report_options),
+                                        diagnostics=run_trace.enabled)
+                    st.session_state.pdf_jobs.append(job.id)
+
+            export_jobs_panel()
 
         else:
             st.write("Please select at least one column to display.")
@@ -615,3 +493,7 @@ def home_page():
 
 if st.session_state.page == 'home':
     home_page()
+
+run_trace.count(held_mb=round(data_manager.current_bytes / 1e6, 1))
+run_trace.finish()
+diagnostics_panel(run_trace)
@@ -0,0 +1,145 @@
+"""Content-addressed store for generated exports (PDF, CSV, Excel and Parquet files).
+
+An export is named after a hash of what it shows and how: the upload
+contents (the dataset key), the filters, the grid edits and the column order
+(``view_key``), plus every render parameter (``artifact_key``). Asking again
+for an export that was already produced, by this session or any other,
+reads the stored file instead of rendering it again. The directory is capped
+by total size and the least recently used files are removed first.
+"""
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import asdict
+from io import BytesIO
+
+from disk_cache import CACHE_DIR, LRUDirectory
+
+ARTIFACT_DIR = os.environ.get("MERGE_TABLE_ARTIFACT_DIR", os.path.join(CACHE_DIR, "artifacts"))
+# Size cap for the stored exports (MB)
+ARTIFACT_CACHE_MB = int(os.environ.get("MERGE_TABLE_ARTIFACT_CACHE_MB", "1024"))
+
+# Bump when a change to the export code changes its output, so stale files are not served
+ARTIFACT_VERSION = 2
+
+
+def view_key(dataset_key, predicates, edits, columns):
+    """Hash of the rows and columns an export shows: the dataset, filters, grid edits and column order."""
+    digest = hashlib.sha256(b'view')
+    digest.update(dataset_key.encode())
+    digest.update(repr(sorted(predicates.items(), key=lambda item: str(item[0]))).encode())
+    digest.update(repr([(edit.row, edit.column, edit.new) for edit in edits]).encode())
+    digest.update(repr(list(columns)).encode())
+    return digest.hexdigest()
+
+
+def artifact_key(kind, view, **params):
+    """Hash of one export of ``view``: its kind ('pdf', 'csv') and the parameters it is rendered with."""
+    digest = hashlib.sha256(f"{kind}:{ARTIFACT_VERSION}:{view}".encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def pdf_key(view, options):
+    """``artifact_key`` of a PDF export of ``view`` with ``ReportOptions`` ``options``.
+
+    How the PDF is rendered (streaming, worker processes) does not change what
+    it shows, so those options are left out.
+    """
+    params = {name: value for name, value in asdict(options).items() if name not in ('streaming', 'workers')}
+    return artifact_key('pdf', view, logo=file_stamp(options.logo_path), **params)
+
+
+def file_stamp(path):
+    """Size and modification time of ``path``, so a replaced logo makes a new key."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ArtifactStore(LRUDirectory):
+    """Export files named ``<key>.<extension>``."""
+
+    suffix = ('.pdf', '.csv', '.xlsx', '.parquet')
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key, extension):
+        """The stored bytes of ``key``, or ``None`` when it is not stored."""
+        if not self.enabled:
+            return None
+        path = self.path(key, extension)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def size(self, key, extension):
+        """Size in bytes of the stored ``key``, or ``None`` when it is not stored."""
+        if not self.enabled:
+            return None
+        try:
+            return os.path.getsize(self.path(key, extension))
+        except OSError:
+            return None
+
+    def put(self, key, extension, data):
+        """Store ``data`` under ``key``. Returns success."""
+        if len(data) > self.max_bytes:
+            return False
+        return self.write(key, extension, lambda f: f.write(data)) is not None
+
+    def write(self, key, extension, write):
+        """Store what ``write(f)`` writes to a binary file under ``key``; returns its path, or ``None``.
+
+        The file is written to disk as it is produced, not collected in memory first.
+        """
+        if not self.enabled:
+            return None
+        # Write under a temporary name so readers never see a half-written file
+        tmp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        path = self.path(key, extension)
+        try:
+            # An unwritable directory only means nothing is stored
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            if os.path.getsize(tmp_path) > self.max_bytes:
+                return None
+            os.replace(tmp_path, path)
+        except OSError:
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+        return path
+
+    def get_or_write(self, key, extension, write):
+        """The stored bytes of ``key``; on a miss ``write(f)`` produces them, and they are stored."""
+        data = self.get(key, extension)
+        if data is not None:
+            return data
+        path = self.write(key, extension, write) if self.enabled else None
+        if path is None:
+            # Not stored (disabled or too large): produce the bytes in memory instead
+            buffer = BytesIO()
+            write(buffer)
+            return buffer.getvalue()
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+artifact_store = ArtifactStore(ARTIFACT_DIR, ARTIFACT_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,321 @@
+"""Headless merge -> filter -> CSV/Excel/Parquet/PDF exports, for scheduled runs.
+
+Does for every input set what the home page does for one upload, with the
+same parsing, merge, filter and render code:
+
+    python batch.py INPUT [INPUT ...] --output OUT_DIR --title "Daily report" --note "one - two"
+    python batch.py --manifest sets.json --output OUT_DIR
+
+An INPUT directory holding CSV/Excel files is one input set; a directory of
+subdirectories is one set per subdirectory (files of a set are merged in
+name order, the first file providing the key column). A manifest is a JSON
+list of ``{"name": ..., "files": [...]}`` objects, optionally with
+``"filters"`` (column -> accepted values), ``"ranges"`` (column ->
+``[low, high]``), ``"columns"`` and ``"title"``, which override the command
+line for that set.
+
+Sets are processed in parallel, one per worker process
+(``--jobs``/``MERGE_TABLE_BATCH_WORKERS``), and a throughput summary is
+printed at the end. The exit status is 1 if any set failed.
+
+``--engine disk`` merges and filters in a SQLite database instead of in
+memory (see ``disk_engine``), for input sets larger than RAM; files are then
+read from disk in chunks and cell values are kept as the text in the file.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from dataclasses import dataclass, field, replace
+
+from disk_engine import open_dataset
+from exports import EXPORT_FORMATS
+from filter_engine import FilterIndex, filter_positions
+from merge_engine import merge_uploads, prepare_uploads
+from pdf_layout import column_measurements, header_names, plan_layout
+from pdf_report import ReportOptions, build_report
+from workers import process_pool, worker_count
+
+DATA_EXTENSIONS = ('.csv', '.xlsm', '.xlsx')
+
+# Input sets processed at the same time (0 or unset = one per CPU)
+BATCH_WORKERS = worker_count("MERGE_TABLE_BATCH_WORKERS")
+
+DEFAULT_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'path', 'logo.jpg')
+
+
+@dataclass
+class InputSet:
+    """Files merged into one export, with per-set overrides from a manifest."""
+    name: str
+    files: list
+    filters: dict = field(default_factory=dict)
+    ranges: dict = field(default_factory=dict)
+    columns: list = None
+    title: str = None
+
+
+@dataclass
+class SetResult:
+    """Outcome and size of one processed input set."""
+    name: str
+    files: int = 0
+    input_bytes: int = 0
+    rows: int = 0
+    columns: int = 0
+    pages: int = 0
+    seconds: float = 0.0
+    outputs: list = field(default_factory=list)
+    messages: list = field(default_factory=list)
+    error: str = None
+
+
+def data_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(DATA_EXTENSIONS) and os.path.isfile(os.path.join(directory, name)))
+
+
+def discover_sets(inputs):
+    """Input sets of the INPUT directories (or single files) on the command line."""
+    sets = []
+    for path in inputs:
+        if os.path.isfile(path):
+            sets.append(InputSet(os.path.splitext(os.path.basename(path))[0], [path]))
+            continue
+        files = data_files(path)
+        if files:
+            sets.append(InputSet(os.path.basename(os.path.normpath(path)), files))
+        for name in sorted(os.listdir(path)):
+            subdirectory = os.path.join(path, name)
+            if os.path.isdir(subdirectory) and data_files(subdirectory):
+                sets.append(InputSet(name, data_files(subdirectory)))
+    return sets
+
+
+def load_manifest(path):
+    """Input sets listed in a JSON manifest; relative file paths are taken from the manifest's directory."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        entries = json.load(f)
+    sets = []
+    for i, entry in enumerate(entries):
+        files = [os.path.join(base, name) for name in entry['files']]
+        sets.append(InputSet(entry.get('name', f"set{i + 1}"), files, entry.get('filters', {}),
+                             {column: tuple(bounds) for column, bounds in entry.get('ranges', {}).items()},
+                             entry.get('columns'), entry.get('title')))
+    return sets
+
+
+def parse_assignment(text):
+    column, sep, value = text.partition('=')
+    if not sep or not column:
+        raise argparse.ArgumentTypeError(f"expected COLUMN=VALUE, got {text!r}")
+    return column, value
+
+
+def set_predicates(index, input_set):
+    """Filter predicates of ``input_set`` in the form ``FilterIndex.select`` takes.
+
+    ``index`` is a ``FilterIndex`` or a ``disk_engine.DiskDataset``.
+    """
+    predicates = {}
+    for column, values in input_set.filters.items():
+        if index.column(column).is_range:
+            raise ValueError(f"Column {column!r} is numeric; filter it with a range")
+        predicates[column] = list(values)
+    for column, (low, high) in input_set.ranges.items():
+        if not index.column(column).is_range:
+            raise ValueError(f"Column {column!r} is not numeric; filter it by values")
+        predicates[column] = (float(low), float(high))
+    return predicates
+
+
+def pandas_set(input_set, result):
+    """Merge and filter ``input_set`` in memory: ``(filtered_df, dataset_key, merged_df)``."""
+    uploads, names, keys, files = [], [], [], []
+    for path in input_set.files:
+        with open(path, 'rb') as f:
+            data = f.read()
+        result.input_bytes += len(data)
+        # One file at a time: the sets themselves already run in parallel
+        (upload,), (key,) = prepare_uploads([(os.path.basename(path), data)])
+        if upload.df.empty:
+            result.messages.append(f"The file {os.path.basename(path)} is empty.")
+        else:
+            uploads.append(upload)
+            names.append(os.path.basename(path))
+            keys.append(key)
+            files.append((os.path.basename(path), data))
+    if not uploads:
+        raise ValueError("No data in the input files")
+
+    merged_df, dataset_key, reports, _ = merge_uploads(uploads, names, keys, files)
+    key_column = merged_df.columns[0]
+    result.messages.extend(report.message(key_column) for report in reports if report.skipped)
+
+    index = FilterIndex(merged_df)
+    filtered_df = merged_df.take(filter_positions(index, set_predicates(index, input_set)))
+    filtered_df = filtered_df.reset_index(drop=True)
+    if input_set.columns:
+        filtered_df = filtered_df[input_set.columns]
+    return filtered_df, dataset_key, merged_df
+
+
+def disk_set(input_set, result):
+    """Merge and filter ``input_set`` in a SQLite database: ``(view, dataset_key, sample_df)``.
+
+    The view is read back in chunks by the exporters; the sample of the
+    merged rows sizes the PDF columns.
+    """
+    names = [os.path.basename(path) for path in input_set.files]
+    result.input_bytes += sum(os.path.getsize(path) for path in input_set.files)
+    dataset, messages = open_dataset(input_set.files, names)
+    result.messages.extend(messages)
+    key_column = dataset.columns[0]
+    result.messages.extend(report.message(key_column) for report in dataset.reports if report.skipped)
+
+    view = dataset.select(set_predicates(dataset, input_set))
+    if input_set.columns:
+        view = view.with_columns(input_set.columns)
+    return view, dataset.key, dataset.sample()
+
+
+def process_set(input_set, options, output_dir, formats, engine='pandas'):
+    """Merge, filter and export one input set; errors are reported in the result, not raised."""
+    started = time.perf_counter()
+    result = SetResult(input_set.name, files=len(input_set.files))
+    try:
+        if engine == 'disk':
+            filtered_df, dataset_key, merged_df = disk_set(input_set, result)
+        else:
+            filtered_df, dataset_key, merged_df = pandas_set(input_set, result)
+        result.rows = len(filtered_df) - 1  # the sub-header row is always kept
+        result.columns = filtered_df.shape[1]
+
+        os.makedirs(output_dir, exist_ok=True)
+        for fmt, export_format in EXPORT_FORMATS.items():
+            if fmt in formats:
+                path = os.path.join(output_dir, f"{input_set.name}.{export_format.extension}")
+                with open(path, 'wb') as f:
+                    export_format.write(filtered_df, f)
+                result.outputs.append(path)
+        if 'pdf' in formats:
+            if input_set.title is not None:
+                options = replace(options, title=input_set.title)
+            measures = column_measurements(dataset_key, merged_df, options.fontsize)
+            column_pages = plan_layout(filtered_df, measures, options.col_size, options.b_col_size,
+                                       options.last_col_size)
+            pdf_path = os.path.join(output_dir, f"{input_set.name}.pdf")
+            pages = []
+            with open(pdf_path, 'wb') as f:
+                build_report(f, filtered_df, header_names(filtered_df.columns), column_pages, options,
+                             progress=pages.append)
+            result.pages = pages[-1] if pages else 0
+            result.outputs.append(pdf_path)
+    except Exception as exc:
+        result.error = f"{type(exc).__name__}: {exc}"
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def run_sets(sets, options, output_dir, formats, jobs, engine='pandas'):
+    """Yield a ``SetResult`` per input set as each one finishes."""
+    if jobs > 1 and len(sets) > 1:
+        pool = process_pool('batch', jobs)
+        futures = [pool.submit(process_set, input_set, options, output_dir, formats, engine)
+                   for input_set in sets]
+        for future in as_completed(futures):
+            yield future.result()
+    else:
+        for input_set in sets:
+            yield process_set(input_set, options, output_dir, formats, engine)
+
+
+def print_summary(results, seconds):
+    done = [result for result in results if result.error is None]
+    megabytes = sum(result.input_bytes for result in results) / 1e6
+    rows = sum(result.rows for result in done)
+    pages = sum(result.pages for result in done)
+    print(f"\n{len(done)}/{len(results)} sets in {seconds:.2f}s: "
+          f"{len(done) / seconds:.2f} sets/s, {megabytes / seconds:.2f} MB/s in, "
+          f"{rows / seconds:.0f} rows/s, {pages / seconds:.1f} PDF pages/s")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Merge, filter and export sets of CSV/Excel files.")
+    parser.add_argument('inputs', nargs='*', help="input set directories (or single files)")
+    parser.add_argument('--manifest', help="JSON list of input sets")
+    parser.add_argument('--output', '-o', default='merge', help="output directory (default: merge)")
+    parser.add_argument('--format', dest='formats', action='append', choices=(*EXPORT_FORMATS, 'pdf'),
+                        help="export format, may be repeated (default: csv and pdf)")
+    parser.add_argument('--filter', action='append', default=[], type=parse_assignment, metavar='COLUMN=VALUE[,VALUE...]',
+                        help="keep rows whose COLUMN is one of the values")
+    parser.add_argument('--range', action='append', default=[], type=parse_assignment, metavar='COLUMN=LOW:HIGH',
+                        help="keep rows whose numeric COLUMN is between LOW and HIGH")
+    parser.add_argument('--columns', help="comma-separated columns to export, in order")
+    parser.add_argument('--jobs', '-j', type=int, default=BATCH_WORKERS, help="input sets processed at once")
+    parser.add_argument('--engine', choices=('pandas', 'disk'), default='pandas',
+                        help="merge and filter in memory (pandas) or in a SQLite database on disk")
+
+    report = parser.add_argument_group("PDF")
+    report.add_argument('--title', default="")
+    report.add_argument('--confidential', default="Confidential")
+    report.add_argument('--team', default="", help="create date shown at the bottom of each page")
+    report.add_argument('--confirm', default="", help="confirmed by")
+    report.add_argument('--signature-data', default="")
+    report.add_argument('--note', default="", help="content note, '-' separates paragraphs")
+    report.add_argument('--row-page', type=int, default=9, help="rows per page")
+    report.add_argument('--font-size', type=float, default=8.0)
+    report.add_argument('--col-size', type=int, default=80, help="narrowest column")
+    report.add_argument('--big-col-size', type=int, default=300, help="widest column")
+    report.add_argument('--last-col-size', type=int, default=80, help="narrowest column on the last column page")
+    report.add_argument('--logo', default=DEFAULT_LOGO)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    sets = discover_sets(args.inputs)
+    if args.manifest:
+        sets.extend(load_manifest(args.manifest))
+    if not sets:
+        parser.error("no input sets found")
+
+    formats = set(args.formats or ('csv', 'pdf'))
+    if 'pdf' in formats and not args.note.strip():
+        parser.error("--note is required for PDF exports")
+
+    filters = dict(args.filter)
+    ranges = dict(args.range)
+    for input_set in sets:
+        input_set.filters = {**{column: values.split(',') for column, values in filters.items()},
+                             **input_set.filters}
+        input_set.ranges = {**{column: tuple(bounds.split(':', 1)) for column, bounds in ranges.items()},
+                            **input_set.ranges}
+        if input_set.columns is None and args.columns:
+            input_set.columns = args.columns.split(',')
+
+    options = ReportOptions(title=args.title, confidential=args.confidential, team=args.team,
+                            confirm=args.confirm, signature_data=args.signature_data, note=args.note,
+                            row_page=args.row_page, fontsize=args.font_size, col_size=args.col_size,
+                            b_col_size=args.big_col_size, last_col_size=args.last_col_size,
+                            logo_path=args.logo, streaming=True, workers=1)
+
+    started = time.perf_counter()
+    results = []
+    for result in run_sets(sets, options, args.output, formats, args.jobs, args.engine):
+        results.append(result)
+        status = "FAILED " + result.error if result.error else f"{result.rows} rows, {result.pages} pages"
+        print(f"{result.name}: {status} ({result.files} files, {result.seconds:.2f}s)")
+        for message in result.messages:
+            print(f"  {message}")
+    print_summary(results, time.perf_counter() - started)
+    return 1 if any(result.error for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""Benchmarks of the processing stages behind the app, on synthetic inputs.
+
+    python bench.py --rows 100000 --cols 40 --files 3 --output bench.json
+    python bench.py --rows 100000 --cols 40 --files 3 --baseline bench.json
+
+Generates ``--files`` CSV or XLSX files that look like the uploads the app
+expects (header row, sub-header row, a shared key column, a 'filter' column
+in the first file) and times each stage on its own, bypassing the parse,
+merge and layout caches:
+
+    parse     parse every file (ingest.parse_file)
+    normalize compact column types of each file (normalize.normalize_frame)
+    merge     multi-file join on the first column (merge_engine.multi_way_join)
+    filter    build the filter index and filter on the 'filter' column
+    grid      one AgGrid window, serialized the way st_aggrid does
+    layout    column measurement and column-page planning
+    pdf       PDF build of the first ``--pdf-rows`` filtered rows
+
+Each stage runs ``--repeat`` times and the fastest run is kept; one more run
+under tracemalloc records the stage's peak traced memory, plus the Arrow
+memory the stage allocates (pyarrow buffers are not traced). Results are
+written as JSON. With ``--baseline`` each stage is compared against a
+stored result and stages slower (or larger) than ``--threshold`` are flagged,
+making the exit status 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import string
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from diagnostics import peak_rss_mb
+from filter_engine import FilterIndex, filter_positions
+from grid_view import GridFeed
+from ingest import parse_file, read_options
+from merge_engine import key_index, multi_way_join
+from pdf_layout import column_measurements, header_names, plan_layout
+from normalize import normalize_frame
+from pdf_report import ReportOptions, build_report
+
+STAGES = ('parse', 'normalize', 'merge', 'filter', 'grid', 'layout', 'pdf')
+
+DEFAULT_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'path', 'logo.jpg')
+
+
+def synthetic_frame(file_no, rows, cols, text_len, rng):
+    """One upload: every third column holds text of about ``text_len`` characters, the rest numbers."""
+    keys = rng.permutation(rows)
+    data = {'ID': keys.astype(str)}
+    if file_no == 0:
+        data['filter'] = rng.choice(['a', 'b', 'c'], rows)
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(500)]
+    for c in range(cols):
+        name = f"F{file_no}C{c}" if c % 4 else f"Unnamed: {file_no}_{c}"
+        if c % 3 == 1:
+            texts = []
+            for _ in range(min(rows, 1000)):
+                text = ''
+                while len(text) < text_len:
+                    text += random.choice(words) + ' '
+                texts.append(text[:text_len].strip())
+            values = np.array(texts, dtype=object)[rng.integers(0, len(texts), rows)]
+        else:
+            values = rng.integers(0, 100000, rows).astype(float)
+            values[rng.random(rows) < 0.05] = np.nan  # blanks, read back as NaN
+        data[name] = values
+    df = pd.DataFrame(data)
+    # Sub-header row, as in the uploads the app expects
+    sub_header = pd.DataFrame([[f"sub{c}" for c in range(df.shape[1])]], columns=df.columns)
+    return pd.concat([sub_header, df], ignore_index=True)
+
+
+def synthetic_files(rows, cols, text_len, n_files, fmt='csv', seed=0):
+    """``(name, bytes)`` of ``n_files`` uploads sharing an ID column, in random row order."""
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    files = []
+    for file_no in range(n_files):
+        df = synthetic_frame(file_no, rows, cols, text_len, rng)
+        buffer = BytesIO()
+        if fmt == 'xlsx':
+            df.to_excel(buffer, index=False)
+        else:
+            df.to_csv(buffer, index=False)
+        files.append((f"file{file_no}.{fmt}", buffer.getvalue()))
+    return files
+
+
+def stage_timer(timings):
+    """Stage runner recording the wall time of each stage in ``timings``."""
+    def run(stage, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        timings[stage] = time.perf_counter() - started
+        return result
+    return run
+
+
+def stage_tracer(peaks):
+    """Stage runner recording, in ``peaks``, the peak memory (MB) each stage adds.
+
+    Call with tracemalloc running. Arrow buffers live outside the Python heap,
+    so the stage's Arrow allocations are added to its traced peak: the new
+    Arrow high-water mark when the stage raised it, else what it still holds.
+    """
+    def run(stage, func, *args):
+        gc.collect()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        arrow_base, arrow_max = arrow_memory()
+        result = func(*args)
+        peaks[stage] = (tracemalloc.get_traced_memory()[1] - base) / 1e6
+        arrow_after, arrow_max_after = arrow_memory()
+        arrow_peak = arrow_after - arrow_base
+        if arrow_max_after > arrow_max:
+            arrow_peak = max(arrow_peak, arrow_max_after - arrow_base)
+        peaks[stage] += max(arrow_peak, 0) / 1e6
+        return result
+    return run
+
+
+def arrow_memory():
+    """Bytes currently allocated by pyarrow and its allocator's high-water mark (zeros without pyarrow)."""
+    if pa is None:
+        return 0, 0
+    return pa.total_allocated_bytes(), pa.default_memory_pool().max_memory()
+
+
+def run_stages(files, pdf_rows, run_no, run_stage):
+    """Run the pipeline once, each stage through ``run_stage(stage, func, *args)``."""
+    frames = run_stage('parse', lambda: [parse_file(name, data, **read_options(name)) for name, data in files])
+    key_column = frames[0].columns[0]
+
+    def normalize():
+        return [normalize_frame(df, df.columns.get_loc(key_column) if key_column in df.columns else None)[0]
+                for df in frames]
+    compact = run_stage('normalize', normalize)
+    if len(frames) > 1:
+        merged_df, _ = run_stage('merge', lambda: multi_way_join(compact, [name for name, _ in files], key_column,
+                                                                 [key_index(df, key_column) for df in frames]))
+    else:
+        merged_df = run_stage('merge', lambda: compact[0])
+
+    def filter_rows():
+        index = FilterIndex(merged_df)
+        predicates = {'filter': ['a', 'b']} if 'filter' in merged_df.columns else {}
+        return merged_df.take(filter_positions(index, predicates)).reset_index(drop=True)
+    filtered_df = run_stage('filter', filter_rows)
+
+    def grid_payload():
+        # A fresh view key per run, so the cached sort order is not hit
+        feed = GridFeed(f"bench:{run_no}", filtered_df)
+        return feed.window(filtered_df.columns.tolist(), 0, filtered_df.columns[1]).to_json(orient='records')
+    run_stage('grid', grid_payload)
+
+    def layout():
+        # A fresh dataset key per run, so the measurement cache is not hit
+        measures = column_measurements(('bench', run_no), merged_df, 8.0)
+        return plan_layout(filtered_df, measures, 80, 300, 80)
+    column_pages = run_stage('layout', layout)
+
+    def render():
+        buffer = BytesIO()
+        options = ReportOptions(title="Benchmark", team="bench", note="first - second", logo_path=DEFAULT_LOGO)
+        pdf_df = filtered_df.iloc[:pdf_rows + 1]
+        build_report(buffer, pdf_df, header_names(pdf_df.columns), column_pages, options)
+        return buffer
+    run_stage('pdf', render)
+
+
+def compare(results, baseline, threshold, min_seconds=0.01, min_mb=1.0):
+    """Lines describing each stage against ``baseline``, and whether any regressed.
+
+    Differences below ``min_seconds`` / ``min_mb`` are treated as noise.
+    """
+    lines = []
+    regressed = False
+    for stage, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if previous is None:
+            lines.append(f"{stage:9} {current['seconds']:9.3f}s  (no baseline)")
+            continue
+        ratio = current['seconds'] / previous['seconds'] if previous['seconds'] else 1.0
+        memory_ratio = current['peak_mb'] / previous['peak_mb'] if previous.get('peak_mb') else 1.0
+        flags = []
+        if ratio > 1 + threshold and current['seconds'] - previous['seconds'] > min_seconds:
+            flags.append("SLOWER")
+        if memory_ratio > 1 + threshold and current['peak_mb'] - previous.get('peak_mb', 0) > min_mb:
+            flags.append("MORE MEMORY")
+        regressed = regressed or bool(flags)
+        lines.append(f"{stage:9} {current['seconds']:9.3f}s vs {previous['seconds']:9.3f}s ({ratio - 1:+.0%})"
+                     f"  {current['peak_mb']:8.1f} MB vs {previous.get('peak_mb', 0):8.1f} MB"
+                     f"  {' '.join(flags)}")
+    return lines, regressed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time the app's processing stages on synthetic inputs.")
+    parser.add_argument('--rows', type=int, default=20000, help="data rows per file")
+    parser.add_argument('--cols', type=int, default=20, help="columns per file besides the key")
+    parser.add_argument('--text-len', type=int, default=40, help="length of the text cells")
+    parser.add_argument('--files', type=int, default=2, help="number of files to merge")
+    parser.add_argument('--format', choices=('csv', 'xlsx'), default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (the fastest is kept)")
+    parser.add_argument('--pdf-rows', type=int, default=500, help="rows rendered in the pdf stage")
+    parser.add_argument('--stages', default=','.join(STAGES), help="comma-separated stages to report")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced-memory run")
+    parser.add_argument('--output', '-o', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        build_parser().error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    started = time.perf_counter()
+    files = synthetic_files(args.rows, args.cols, args.text_len, args.files, args.format, args.seed)
+    print(f"generated {args.files} {args.format} files, {sum(len(data) for _, data in files) / 1e6:.1f} MB "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    runs = []
+    for run_no in range(args.repeat):
+        gc.collect()
+        runs.append({})
+        run_stages(files, args.pdf_rows, run_no, stage_timer(runs[-1]))
+    peaks = {}
+    if not args.no_memory:
+        tracemalloc.start()
+        run_stages(files, args.pdf_rows, 'traced', stage_tracer(peaks))
+        tracemalloc.stop()
+
+    results = {
+        'config': {key: getattr(args, key) for key in ('rows', 'cols', 'text_len', 'files', 'format', 'seed',
+                                                        'repeat', 'pdf_rows')},
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__,
+                        'numpy': np.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stages': {stage: {'seconds': min(run[stage] for run in runs),
+                           'median_seconds': float(np.median([run[stage] for run in runs])),
+                           'peak_mb': peaks.get(stage, 0.0)}
+                   for stage in stages},
+        'max_rss_mb': peak_rss_mb(),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print("warning: the baseline was recorded with a different configuration")
+        lines, regressed = compare(results, baseline, args.threshold)
+    else:
+        lines = [f"{stage:9} {result['seconds']:9.3f}s  {result['peak_mb']:8.1f} MB"
+                 for stage, result in results['stages'].items()]
+    print("\n".join(lines))
+    print(f"max RSS {results['max_rss_mb']:.0f} MB")
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Process-wide, memory-budgeted store for the data every session works on.
+
+Parsed uploads, their compact forms, joined datasets, each session's
+filtered view and the grid's sort orders are all held here, keyed by content
+hash: a dataset that several sessions upload, or a view they filter the same
+way, is held once and shared. One budget (``MERGE_TABLE_MEMORY_MB``) covers
+everything; over it, entries are evicted least recently used first, starting
+with those that no active session has used for ``SESSION_IDLE_SECONDS``.
+Evicted frames stored with ``spill=True`` are written to the Arrow store in
+``disk_cache`` first and reloaded from it, memory-mapped, when asked for
+again; everything else is rebuilt by its owner on the next miss (parsed and
+joined frames already have their own copy on disk).
+
+Sessions identify themselves per script run with ``enter_session``; reads
+and writes in that thread are then attributed to the session.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from disk_cache import frame_store
+
+# Memory budget for all cached data (MB); MERGE_TABLE_PARSE_CACHE_MB is still honoured
+MEMORY_BUDGET_MB = int(os.environ.get("MERGE_TABLE_MEMORY_MB",
+                                      os.environ.get("MERGE_TABLE_PARSE_CACHE_MB", "1024")))
+# Sessions without a rerun for this long are idle and their data is evicted first
+SESSION_IDLE_SECONDS = int(os.environ.get("MERGE_TABLE_SESSION_IDLE_SECONDS", "600"))
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def value_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    raise TypeError(f"Give the size of {type(value).__name__} values as nbytes")
+
+
+@dataclass
+class MemoryUsage:
+    """A snapshot of the ``DataManager``: memory held, sharing and evictions."""
+    budget_bytes: int
+    used_bytes: int
+    entries: int
+    shared_entries: int  # used by more than one session
+    spilled_entries: int  # on disk, reloaded on the next read
+    sessions: int  # active sessions
+    idle_sessions: int
+    hits: int
+    misses: int
+    evictions: int
+
+    def message(self):
+        return (f"{self.used_bytes / 1e6:.0f} of {self.budget_bytes / 1e6:.0f} MB held in {self.entries} entries "
+                f"({self.shared_entries} shared) for {self.sessions} active and {self.idle_sessions} idle "
+                f"session(s); {self.spilled_entries} frame(s) spilled to disk.")
+
+
+class _Entry:
+    __slots__ = ('value', 'nbytes', 'spill', 'sessions')
+
+    def __init__(self, value, nbytes, spill, sessions):
+        self.value = value
+        self.nbytes = nbytes
+        self.spill = spill
+        self.sessions = sessions
+
+
+class DataManager:
+    """Thread-safe LRU of frames (and other values with a known size), bounded by their memory usage."""
+
+    def __init__(self, max_bytes, store=frame_store, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> _Entry
+        self._spilled = set()  # keys of evicted frames kept in the store
+        self._last_seen = {}  # session -> time of its last script run
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enter_session(self, session):
+        """Attribute this thread's reads and writes to ``session`` and mark it active."""
+        self._local.session = session
+        with self._lock:
+            self._last_seen[session] = time.time()
+
+    def _session(self):
+        return getattr(self._local, 'session', None)
+
+    def get(self, key):
+        """The value of ``key``, reloading a spilled frame from disk; ``None`` when it is not held."""
+        session = self._session()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if session is not None:
+                    entry.sessions.add(session)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            spilled = key in self._spilled
+        if not spilled:
+            return None
+        stored = self.store.get(key)
+        if stored is None:
+            with self._lock:
+                self._spilled.discard(key)
+            return None
+        df, _ = stored
+        self.put(key, df, spill=True)
+        return df
+
+    def put(self, key, value, nbytes=None, spill=False):
+        """Hold ``value`` (a DataFrame, an array, or anything with its size given as ``nbytes``).
+
+        With ``spill`` a DataFrame evicted later is written to disk instead of
+        dropped, for values that are costly to rebuild.
+        """
+        if nbytes is None:
+            nbytes = value_nbytes(value)
+        session = self._session()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            sessions = set() if entry is None else entry.sessions
+            if entry is not None:
+                self.current_bytes -= entry.nbytes
+            # Values bigger than the whole budget are not worth evicting everything for
+            if nbytes > self.max_bytes:
+                return
+            if session is not None:
+                sessions.add(session)
+            self._entries[key] = _Entry(value, nbytes, spill, sessions)
+            self.current_bytes += nbytes
+            victims = self._evict()
+        self._spill(victims)
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry.nbytes
+            self._spilled.discard(key)
+
+    def release(self, key):
+        """Drop ``key``, which this thread's session no longer needs, unless another active session uses it."""
+        session = self._session()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.sessions.discard(session)
+            if not entry.sessions & self._active_sessions(time.time()):
+                del self._entries[key]
+                self.current_bytes -= entry.nbytes
+
+    def _active_sessions(self, now):
+        return {session for session, seen in self._last_seen.items() if now - seen <= self.idle_seconds}
+
+    def _evict(self):
+        """Drop entries until the budget is met (lock held); returns the ``(key, entry)`` pairs to spill."""
+        if self.current_bytes <= self.max_bytes:
+            return []
+        active = self._active_sessions(time.time())
+        # Entries no active session uses go first, least recently used first
+        idle = [key for key, entry in self._entries.items() if not entry.sessions & active]
+        victims = []
+        for key in idle + list(self._entries):
+            if self.current_bytes <= self.max_bytes:
+                break
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                continue
+            self.current_bytes -= entry.nbytes
+            self.evictions += 1
+            if entry.spill and isinstance(entry.value, pd.DataFrame):
+                victims.append((key, entry))
+        return victims
+
+    def _spill(self, victims):
+        # Written outside the lock; a read in the meantime misses and rebuilds the value
+        for key, entry in victims:
+            if key in self._spilled or self.store.put(key, entry.value):
+                with self._lock:
+                    self._spilled.add(key)
+
+    def usage(self):
+        with self._lock:
+            now = time.time()
+            active = self._active_sessions(now)
+            # Forget sessions idle for a day; their entries are ordinary LRU entries by now
+            for session in [session for session, seen in self._last_seen.items() if now - seen > 86400]:
+                del self._last_seen[session]
+            return MemoryUsage(
+                budget_bytes=self.max_bytes,
+                used_bytes=self.current_bytes,
+                entries=len(self._entries),
+                shared_entries=sum(1 for entry in self._entries.values() if len(entry.sessions) > 1),
+                spilled_entries=len(self._spilled),
+                sessions=len(active),
+                idle_sessions=len(self._last_seen) - len(active),
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._spilled.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+data_manager = DataManager(MEMORY_BUDGET_MB * 1024 * 1024)
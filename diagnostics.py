@@ -0,0 +1,97 @@
+"""Stage timings, counters and peak memory of script runs and exports.
+
+A ``Trace`` collects the duration of each pipeline stage, counters such as
+rows, columns and pages, and the process's peak RSS. Finished traces are
+written as one JSON line each to the ``merge_table.diagnostics`` logger
+when ``MERGE_TABLE_DIAGNOSTICS`` is set, and can be shown in the sidebar
+diagnostics panel. A disabled trace hands out a shared no-op context
+manager, so instrumented code costs a method call per stage when it is off.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+# Log every trace as a JSON line (and enable tracing for all sessions)
+DIAGNOSTICS = os.environ.get("MERGE_TABLE_DIAGNOSTICS", "") not in ("", "0")
+
+logger = logging.getLogger("merge_table.diagnostics")
+if DIAGNOSTICS and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_NO_STAGE = nullcontext()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (0 where unavailable)."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == 'darwin' else 1e3)
+
+
+class _Stage:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.stages.append({'stage': self.name,
+                                  'seconds': round(time.perf_counter() - self.started, 6),
+                                  'peak_rss_mb': round(peak_rss_mb(), 1)})
+        return False
+
+
+class Trace:
+    """Timings and counters of one script run or export."""
+
+    def __init__(self, name, enabled=DIAGNOSTICS, **fields):
+        self.name = name
+        self.enabled = enabled
+        self.fields = fields
+        self.stages = []
+        self.counters = {}
+        self.started = time.time()
+        self.seconds = None
+
+    def stage(self, name):
+        """Context manager timing the stage ``name``."""
+        return _Stage(self, name) if self.enabled else _NO_STAGE
+
+    def count(self, **counters):
+        if self.enabled:
+            self.counters.update(counters)
+
+    def finish(self):
+        """Close the trace and log it as a JSON line."""
+        if not self.enabled or self.seconds is not None:
+            return
+        self.seconds = round(time.time() - self.started, 6)
+        if DIAGNOSTICS:
+            logger.info(json.dumps(self.as_dict(), default=str))
+
+    def as_dict(self):
+        return {
+            'trace': self.name,
+            **self.fields,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': self.seconds,
+            'stages': self.stages,
+            'counters': self.counters,
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
@@ -0,0 +1,253 @@
+"""On-disk columnar cache for parsed and merged DataFrames.
+
+Frames are written as uncompressed Arrow IPC (Feather v2) files named after
+their content hash, so a browser refresh or another user uploading the same
+report reloads them instead of parsing again. Files are memory-mapped on
+load: the Arrow table is not copied, and null-free numeric columns and text
+columns (as Arrow-backed strings) are handed to pandas without a copy as
+well. Columns keep the compact types of ``normalize``; text that was held in
+object columns comes back as Python strings. The directory is capped by
+total size and the least recently used files are removed first.
+
+Object columns whose cells have several types (the text sub-header over the
+numbers of an Excel column) have no Arrow type. They are stored as the text
+of each cell next to a code giving its type, and converted back on load.
+"""
+import datetime
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # the cache is simply disabled without pyarrow
+    pa = None
+
+CACHE_DIR = os.environ.get(
+    "MERGE_TABLE_CACHE_DIR", os.path.join(os.path.abspath(os.path.dirname(__file__)), "cache"))
+# Size cap for the cache directory (MB)
+DISK_CACHE_MB = int(os.environ.get("MERGE_TABLE_DISK_CACHE_MB", "2048"))
+
+METADATA_KEY = b'merge_table'
+# Names of the mixed-type columns stored as text, in the schema metadata
+MIXED_KEY = b'merge_table_mixed'
+# Names of the categorical columns with string categories, in the schema metadata
+CATEGORIES_KEY = b'merge_table_string_categories'
+# Name prefix of the column holding the cell types of a mixed-type column
+CODES_PREFIX = '\0codes:'
+
+# Cell types of mixed-type columns, by code (0 is a missing cell): (types, cell to text, text to cell).
+# Checked in order, so bool comes before int and Timestamp before datetime before date.
+MIXED_CELL_TYPES = {
+    1: ((str,), str, str),
+    2: ((bool, np.bool_), lambda cell: str(bool(cell)), lambda text: text == 'True'),
+    3: ((int, np.integer), lambda cell: str(int(cell)), int),
+    4: ((float, np.floating), lambda cell: repr(float(cell)), float),
+    5: ((pd.Timestamp,), pd.Timestamp.isoformat, pd.Timestamp),
+    6: ((datetime.datetime,), datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    7: ((datetime.date,), datetime.date.isoformat, datetime.date.fromisoformat),
+    8: ((datetime.time,), datetime.time.isoformat, datetime.time.fromisoformat),
+}
+
+
+def arrow_string_dtype(arrow_type):
+    """``types_mapper`` turning Arrow text into Arrow-backed pandas strings, which share its buffers."""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype('pyarrow')
+    return None
+
+
+def cell_code(kind):
+    for code, (types, _, _) in MIXED_CELL_TYPES.items():
+        if issubclass(kind, types):
+            return code
+    return None
+
+
+def encode_mixed(values):
+    """``(text, codes)`` of an object column whose cells have several types.
+
+    ``None`` when its cells all have the same type, so Arrow stores it as it
+    is, or when one of them has a type not in ``MIXED_CELL_TYPES``.
+    """
+    cells = values.to_numpy(dtype=object)
+    present = np.flatnonzero(~pd.isna(cells))
+    kinds = {}
+    codes = np.zeros(len(cells), dtype=np.int8)
+    for position in present:
+        kind = type(cells[position])
+        if kind not in kinds:
+            kinds[kind] = cell_code(kind)
+        codes[position] = kinds[kind] or 0
+    if len(kinds) < 2 or None in kinds.values():
+        return None
+    text = np.full(len(cells), None, dtype=object)
+    for code in set(kinds.values()):
+        positions = np.flatnonzero(codes == code)
+        to_text = MIXED_CELL_TYPES[code][1]
+        text[positions] = [to_text(cell) for cell in cells[positions]]
+    return text, codes
+
+
+def decode_mixed(text, codes):
+    """The cells ``encode_mixed`` stored as ``text`` and ``codes``, missing cells as NaN."""
+    text = np.asarray(text, dtype=object)
+    cells = np.full(len(text), np.nan, dtype=object)
+    for code in np.unique(codes[codes > 0]):
+        positions = np.flatnonzero(codes == code)
+        from_text = MIXED_CELL_TYPES[code][2]
+        cells[positions] = [from_text(item) for item in text[positions]]
+    return cells
+
+
+class LRUDirectory:
+    """Files ending in ``suffix`` in one directory, evicted least-recently-used past ``max_bytes``.
+
+    Reads touch the file, so its modification time is its last use.
+    """
+
+    suffix = ''
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def usage(self):
+        """Total bytes currently stored."""
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(self.suffix) and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def in_use(self):
+        """Absolute paths of files that must not be evicted."""
+        return set()
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, _, size in entries)
+            pinned = self.in_use()
+            for _, path, size in entries:
+                if total <= self.max_bytes:
+                    break
+                if os.path.abspath(path) in pinned:
+                    continue
+                try:
+                    # Safe on POSIX even if another session still has the file mapped
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+
+class DiskFrameStore(LRUDirectory):
+    """Feather files keyed by content hash."""
+
+    suffix = '.arrow'
+
+    @property
+    def enabled(self):
+        return pa is not None and self.max_bytes > 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Return ``(df, metadata)`` for ``key``, or ``None`` when it is not stored."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+        except (OSError, pa.ArrowException):
+            return None
+        schema_metadata = table.schema.metadata or {}
+        raw = schema_metadata.get(METADATA_KEY)
+        metadata = json.loads(raw) if raw else {}
+        df = table.to_pandas(split_blocks=True, types_mapper=arrow_string_dtype)
+        mixed = json.loads(schema_metadata.get(MIXED_KEY, b'[]'))
+        for column in mixed:
+            codes = df.pop(CODES_PREFIX + column).to_numpy()
+            df.isetitem(df.columns.get_loc(column), decode_mixed(df[column], codes))
+        # Text held in object columns (as parsed) goes back to Python strings, missing cells as NaN
+        object_columns = {column['name'] for column in (table.schema.pandas_metadata or {}).get('columns', [])
+                          if column['numpy_type'] == 'object'}.difference(mixed)
+        for position, column in enumerate(df.columns):
+            if column in object_columns and isinstance(df.dtypes.iloc[position], pd.StringDtype):
+                df.isetitem(position, df.iloc[:, position].to_numpy(dtype=object, na_value=np.nan))
+        # Arrow hands categories back as objects
+        for column in json.loads(schema_metadata.get(CATEGORIES_KEY, b'[]')):
+            values = df[column]
+            df.isetitem(df.columns.get_loc(column), pd.Categorical.from_codes(
+                values.cat.codes, values.cat.categories.astype(pd.StringDtype('pyarrow')), values.cat.ordered))
+        # Arrow hands back missing values of other object columns as None where pandas readers give NaN
+        for column in df.columns[df.dtypes == object]:
+            if df[column].isna().any():
+                df[column] = df[column].where(df[column].notna(), np.nan)
+        return df, metadata
+
+    def put(self, key, df, **metadata):
+        """Store ``df``; frames Arrow cannot round-trip exactly are skipped. Returns success."""
+        if not self.enabled:
+            return False
+        # Non-string or repeated column names do not survive the round trip
+        if not all(isinstance(c, str) for c in df.columns) or not df.columns.is_unique:
+            return False
+        # Mixed-type columns go in as text, each with a column of cell type codes
+        mixed = {}
+        for position in np.flatnonzero(df.dtypes.to_numpy() == object):
+            encoded = encode_mixed(df.iloc[:, position])
+            if encoded is not None:
+                mixed[position] = encoded
+        if mixed:
+            df = df.copy(deep=False)
+            for position, (text, _) in mixed.items():
+                df.isetitem(position, text)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowException, ValueError, TypeError):
+            return False
+        for position, (_, codes) in mixed.items():
+            table = table.append_column(CODES_PREFIX + df.columns[position], pa.array(codes))
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str).encode()
+        schema_metadata[MIXED_KEY] = json.dumps([df.columns[position] for position in mixed]).encode()
+        schema_metadata[CATEGORIES_KEY] = json.dumps([
+            column for column, dtype in df.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype) and isinstance(dtype.categories.dtype, pd.StringDtype)]).encode()
+        table = table.replace_schema_metadata(schema_metadata)
+
+        # Write under a temporary name so readers never see a half-written file
+        tmp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            # An unwritable directory only means nothing is stored
+            os.makedirs(self.directory, exist_ok=True)
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self.path(key))
+        except (OSError, pa.ArrowException):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+
+frame_store = DiskFrameStore(CACHE_DIR, DISK_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,556 @@
+"""Disk-backed merge and filter (SQLite) for inputs larger than memory.
+
+The pandas path holds every upload, the merged frame and each filtered frame
+in memory. ``DiskDataset`` keeps them in a SQLite database on disk instead:
+
+- each upload is read ``ENGINE_CHUNK_ROWS`` rows at a time into a table of
+  its own, every value kept as the text in the file (NULL for empty cells),
+  and indexed on the key column;
+- the inner join on the first column of the first upload is a single
+  ``INSERT ... SELECT`` into the ``merged`` table, in the first upload's row
+  order, with the same column names as ``merge_engine.multi_way_join``;
+- a filter selects row ids of ``merged`` into a table per predicate set,
+  always keeping the sub-header row.
+
+Row counts, and each filter or sort column's type, range or values, are stored
+in the database as well, the latter the first time the column is used, so
+reruns only read them back instead of scanning ``merged`` again.
+
+A ``DiskView`` reads a filtered view back a grid window or an export chunk at
+a time, which is what the grid, the streaming exporters and the PDF renderer
+consume, so memory stays bounded by the chunk size and SQLite's page cache
+however large the inputs are. Databases are named after the content keys of
+their uploads, so a dataset is loaded once, and are kept in ``ENGINE_DIR``
+capped by total size like the other caches; databases of datasets still open
+in this process (a session's rerun, a queued export) are not evicted.
+"""
+import hashlib
+import os
+import sqlite3
+import uuid
+import weakref
+from io import BytesIO
+
+import pandas as pd
+
+from disk_cache import CACHE_DIR, LRUDirectory
+from grid_view import GRID_PAGE_SIZE, GRID_PREFETCH_PAGES
+from merge_engine import JoinReport, merged_column_names
+
+# Use the disk engine in the app by default
+DISK_ENGINE = os.environ.get("MERGE_TABLE_DISK_ENGINE", "") not in ("", "0")
+ENGINE_DIR = os.environ.get("MERGE_TABLE_ENGINE_DIR", os.path.join(CACHE_DIR, "sqlite"))
+# Size cap for the engine's databases (MB)
+ENGINE_DISK_MB = int(os.environ.get("MERGE_TABLE_ENGINE_DISK_MB", "20480"))
+# Rows read from an upload, or handed to an exporter, at a time
+ENGINE_CHUNK_ROWS = int(os.environ.get("MERGE_TABLE_ENGINE_CHUNK_ROWS", "10000"))
+# SQLite page cache per connection (MB); sorts beyond it spill to temporary files
+ENGINE_CACHE_MB = 64
+# Rows sampled across the merged table to size the PDF columns
+LAYOUT_SAMPLE_ROWS = 20000
+
+MERGED = "merged"
+# Bump when the database layout changes, so databases built before are not opened
+DATABASE_VERSION = 3
+
+
+class DatabaseDirectory(LRUDirectory):
+    suffix = '.sqlite'
+
+    def in_use(self):
+        return {os.path.abspath(dataset.path) for dataset in list(_open_datasets)}
+
+
+databases = DatabaseDirectory(ENGINE_DIR, ENGINE_DISK_MB * 1024 * 1024)
+# Datasets and views alive in this process: their databases and selection tables are kept
+_open_datasets = weakref.WeakSet()
+_open_views = weakref.WeakSet()
+
+
+def source_key(name, source):
+    """Content hash of an upload given as bytes or as a file path, read in blocks."""
+    digest = hashlib.sha256(b'disk')
+    digest.update(os.path.splitext(name)[1].lower().encode())
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_key(upload_keys):
+    digest = hashlib.sha256(f"dataset:{DATABASE_VERSION}".encode())
+    for key in upload_keys:
+        digest.update(key.encode())
+    return digest.hexdigest()
+
+
+def column_labels(header):
+    """Column names for an Excel header row, as ``pd.read_excel`` would give them."""
+    labels = []
+    seen = {}
+    for i, value in enumerate(header):
+        label = f"Unnamed: {i}" if value is None else str(value)
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        seen.setdefault(label, 0)
+        labels.append(label)
+    return labels
+
+
+def cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # as pandas reads whole numbers from Excel
+    return str(value)
+
+
+def read_chunks(name, source, chunk_rows=None):
+    """``(columns, chunks)`` of an upload: its column names and lists of row tuples of text (None when empty)."""
+    chunk_rows = chunk_rows or ENGINE_CHUNK_ROWS
+    handle = BytesIO(source) if isinstance(source, bytes) else source
+    if name.endswith('.csv'):
+        try:
+            reader = pd.read_csv(handle, dtype=str, chunksize=chunk_rows)
+            first = next(reader)
+        except (StopIteration, pd.errors.EmptyDataError):
+            return [], iter(())
+
+        def csv_chunks():
+            yield csv_rows(first)
+            for chunk in reader:
+                yield csv_rows(chunk)
+        return [str(column) for column in first.columns], csv_chunks()
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], iter(())
+    columns = column_labels(header)
+
+    def excel_chunks():
+        chunk = []
+        for row in rows:
+            chunk.append(tuple(cell_text(value) for value in row[:len(columns)])
+                         + (None,) * (len(columns) - len(row)))
+            if len(chunk) == chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        workbook.close()
+    return columns, excel_chunks()
+
+
+def csv_rows(chunk):
+    cells = chunk.astype(object)
+    return list(cells.where(cells.notna(), None).itertuples(index=False, name=None))
+
+
+def quoted(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(path, create=False):
+    """A connection to the database at ``path`` (which must exist unless ``create``)."""
+    uri = f"file:{path}?mode={'rwc' if create else 'rw'}"
+    connection = sqlite3.connect(uri, uri=True, timeout=60, check_same_thread=False)
+    connection.execute(f"PRAGMA cache_size = -{ENGINE_CACHE_MB * 1024}")
+    connection.execute("PRAGMA temp_store = FILE")
+    connection.create_function('is_number', 1, _is_number, deterministic=True)
+    return connection
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except (TypeError, ValueError):
+        return 0
+    return 1
+
+
+def load_dataset(sources, names, path):
+    """Load and join the uploads into a new database at ``path``; returns the join reports and messages."""
+    connection = connect(path, create=True)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("CREATE TABLE uploads (upload INTEGER, name TEXT, columns TEXT)")
+    connection.execute("CREATE TABLE reports (upload INTEGER, name TEXT, rows INTEGER, missing_key_column INTEGER,"
+                       " duplicate_keys TEXT, unmatched_rows INTEGER)")
+    connection.execute("CREATE TABLE merged_columns (position INTEGER, name TEXT)")
+    connection.execute("CREATE TABLE dataset_info (rows INTEGER)")
+    # Filled in by DiskColumn and DiskDataset.select
+    connection.execute("CREATE TABLE column_stats (position INTEGER PRIMARY KEY, is_range INTEGER, low REAL, high REAL, "
+                       "sorts_numeric INTEGER)")
+    connection.execute("CREATE TABLE column_categories (position INTEGER, rank INTEGER, value TEXT, "
+                       "PRIMARY KEY (position, rank))")
+    connection.execute("CREATE TABLE selections (name TEXT PRIMARY KEY, rows INTEGER)")
+    messages = []
+    loaded = []  # (upload number, name, columns)
+    for i, (source, name) in enumerate(zip(sources, names)):
+        columns, chunks = read_chunks(name, source)
+        table = f"upload_{i}"
+        connection.execute(f"CREATE TABLE {table} (pos INTEGER PRIMARY KEY, "
+                           + ", ".join(f"c{j} TEXT" for j in range(len(columns))) + ")")
+        insert = (f"INSERT INTO {table} ({', '.join(f'c{j}' for j in range(len(columns)))}) "
+                  f"VALUES ({', '.join('?' * len(columns))})")
+        rows = 0
+        for chunk in chunks:
+            connection.executemany(insert, chunk)
+            rows += len(chunk)
+        if not columns or not rows:
+            messages.append(f"The file {name} is empty.")
+            continue
+        connection.execute("INSERT INTO uploads VALUES (?, ?, ?)", (i, name, "\x1f".join(columns)))
+        loaded.append((i, name, columns, rows))
+    if not loaded:
+        connection.close()
+        raise ValueError("No data in the input files")
+
+    key_column = loaded[0][2][0]
+    reports = []
+    used = []
+    for i, name, columns, rows in loaded:
+        report = JoinReport(name=name, rows=rows)
+        reports.append(report)
+        if key_column not in columns:
+            report.missing_key_column = True
+            continue
+        key = f"c{columns.index(key_column)}"
+        duplicates = connection.execute(f"SELECT {key} FROM upload_{i} GROUP BY {key} HAVING COUNT(*) > 1"
+                                        " LIMIT 100").fetchall()
+        if duplicates:
+            report.duplicate_keys = [value for value, in duplicates]
+            continue
+        connection.execute(f"CREATE INDEX upload_{i}_key ON upload_{i} ({key})")
+        used.append((i, columns, key, report))
+
+    # Same column names (and suffixes) as the pandas join
+    if len(used) > 1:
+        names_out = merged_column_names([pd.DataFrame(columns=columns) for _, columns, _, _ in used], key_column)
+    else:
+        names_out = list(used[0][1]) if used else [key_column]
+    selects, joins = [], []
+    for n, (i, columns, key, _) in enumerate(used):
+        alias = f"t{n}"
+        if n == 0:
+            first_key = f"{alias}.{key}"
+            joins.append(f"upload_{i} {alias}")
+        else:
+            joins.append(f"JOIN upload_{i} {alias} ON {alias}.{key} = {first_key}")
+        for j in range(len(columns)):
+            expression = f"{alias}.c{j}"
+            if n == 0 and f"c{j}" == key:
+                # Keys read from Excel may carry a trailing '.0'
+                expression = (f"CASE WHEN {expression} LIKE '%.0' THEN substr({expression}, 1, "
+                              f"length({expression}) - 2) ELSE {expression} END")
+            elif n > 0 and f"c{j}" == key:
+                continue
+            selects.append(expression)
+    connection.execute(f"CREATE TABLE {MERGED} (rid INTEGER PRIMARY KEY, "
+                       + ", ".join(f"m{j} TEXT" for j in range(len(names_out))) + ")")
+    if used:
+        connection.execute(f"INSERT INTO {MERGED} ({', '.join(f'm{j}' for j in range(len(names_out)))}) "
+                           f"SELECT {', '.join(selects)} FROM {' '.join(joins)} ORDER BY t0.pos")
+    merged_rows = connection.execute(f"SELECT COUNT(*) FROM {MERGED}").fetchone()[0]
+    connection.executemany("INSERT INTO merged_columns VALUES (?, ?)", enumerate(names_out))
+    connection.execute("INSERT INTO dataset_info VALUES (?)", (merged_rows,))
+    for report in reports:
+        if not report.skipped:
+            report.unmatched_rows = report.rows - merged_rows
+    connection.executemany("INSERT INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                           [(n, report.name, report.rows, int(report.missing_key_column),
+                             "\x1f".join(map(str, report.duplicate_keys)), report.unmatched_rows)
+                            for n, report in enumerate(reports)])
+    for i, _, _, _ in loaded:
+        connection.execute(f"DROP TABLE upload_{i}")
+    connection.commit()
+    connection.close()
+    return messages
+
+
+def open_dataset(sources, names, upload_keys=None):
+    """The ``DiskDataset`` of the uploads (bytes or file paths), loading them unless already stored.
+
+    Returns ``(dataset, messages)``; ``messages`` name empty uploads. Raises
+    ``ValueError`` when the database cannot be written to ``ENGINE_DIR``.
+    """
+    if upload_keys is None:
+        upload_keys = [source_key(name, source) for name, source in zip(names, sources)]
+    key = dataset_key(upload_keys)
+    path = os.path.join(ENGINE_DIR, key + DatabaseDirectory.suffix)
+    messages = []
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    else:
+        # Build under a temporary name so other sessions never open a half-loaded database
+        tmp_path = os.path.join(ENGINE_DIR, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            os.makedirs(ENGINE_DIR, exist_ok=True)
+            messages = load_dataset(sources, names, tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, sqlite3.OperationalError) as exc:
+            raise ValueError(f"The disk-backed engine cannot store its database in {ENGINE_DIR}: {exc}") from exc
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        databases.evict()
+    return DiskDataset(key, path), messages
+
+
+class DiskColumn:
+    """Filter metadata of one merged column, with the interface of ``filter_engine.ColumnIndex``.
+
+    Worked out by scanning ``merged`` the first time the column is filtered
+    and stored in the database, so later reruns and sessions read it back.
+    """
+
+    def __init__(self, dataset, position):
+        with dataset.connect() as connection:
+            stored = connection.execute("SELECT is_range, low, high, sorts_numeric FROM column_stats "
+                                        "WHERE position = ?", (position,)).fetchone()
+            if stored is None:
+                is_range, low, high, sorts_numeric, categories = self._scan(connection, f"m{position}")
+                try:
+                    connection.executemany("INSERT INTO column_categories VALUES (?, ?, ?)",
+                                           [(position, rank, value) for rank, value in enumerate(categories)])
+                    connection.execute("INSERT INTO column_stats VALUES (?, ?, ?, ?, ?)",
+                                       (position, int(is_range), low, high, int(sorts_numeric)))
+                    connection.commit()
+                except (sqlite3.IntegrityError, sqlite3.OperationalError):
+                    # Stored by another session first, or a read-only database
+                    connection.rollback()
+            else:
+                is_range, low, high, sorts_numeric = stored
+                categories = [] if is_range else [value for value, in connection.execute(
+                    "SELECT value FROM column_categories WHERE position = ? ORDER BY rank", (position,))]
+        self.is_range = bool(is_range)
+        # Numbers below the sub-header row: the grid sorts them by value
+        self.sorts_numeric = bool(sorts_numeric)
+        self.min, self.max = low, high
+        self.categories = categories
+
+    @staticmethod
+    def _scan(connection, column):
+        """``(is_range, min, max, sorts_numeric, categories)`` of ``column``."""
+        # Numeric when every non-empty cell holds a number (the sub-header row included)
+        is_range = not connection.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {MERGED} WHERE {column} IS NOT NULL AND NOT is_number({column}))"
+        ).fetchone()[0]
+        if is_range:
+            low, high = connection.execute(f"SELECT MIN(CAST({column} AS REAL)), MAX(CAST({column} AS REAL)) "
+                                           f"FROM {MERGED}").fetchone()
+            return True, float(low or 0.0), float(high or 0.0), True, []
+        sorts_numeric = not connection.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {MERGED} WHERE rid != 1 AND {column} IS NOT NULL "
+            f"AND NOT is_number({column}))").fetchone()[0]
+        # In order of first appearance, like pd.factorize
+        categories = [value for value, in connection.execute(
+            f"SELECT {column} FROM {MERGED} WHERE {column} IS NOT NULL GROUP BY {column} ORDER BY MIN(rid)")]
+        return False, None, None, sorts_numeric, categories
+
+
+class DiskDataset:
+    """A merged dataset in a SQLite database; ``select`` filters it into a ``DiskView``."""
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+        _open_datasets.add(self)
+        with self.connect() as connection:
+            self.columns = [name for name, in connection.execute(
+                "SELECT name FROM merged_columns ORDER BY position")]
+            self.n_rows = connection.execute("SELECT rows FROM dataset_info").fetchone()[0]
+            self.reports = [JoinReport(name, rows, bool(missing), duplicates.split("\x1f") if duplicates else [],
+                                       unmatched)
+                            for name, rows, missing, duplicates, unmatched in connection.execute(
+                                "SELECT name, rows, missing_key_column, duplicate_keys, unmatched_rows "
+                                "FROM reports ORDER BY upload")]
+        self._columns = {}
+
+    def connect(self):
+        return _Connection(self.path)
+
+    def column(self, name):
+        index = self._columns.get(name)
+        if index is None:
+            index = self._columns[name] = DiskColumn(self, self.columns.index(name))
+        return index
+
+    def _condition(self, predicates):
+        clauses, params = [], []
+        for name, condition in predicates.items():
+            column = f"m{self.columns.index(name)}"
+            if self.column(name).is_range:
+                clauses.append(f"({column} IS NOT NULL AND CAST({column} AS REAL) BETWEEN ? AND ?)")
+                params.extend(float(bound) for bound in condition)
+            elif condition:
+                clauses.append(f"{column} IN ({', '.join('?' * len(condition))})")
+                params.extend(str(value) for value in condition)
+        return " AND ".join(clauses), params
+
+    def select(self, predicates):
+        """The rows matching every predicate (see ``FilterIndex.select``) and the sub-header row, as a view."""
+        condition, params = self._condition(predicates)
+        table = "selected_" + hashlib.sha256(repr((condition, params)).encode()).hexdigest()[:16]
+        with self.connect() as connection:
+            stored = connection.execute("SELECT rows FROM selections WHERE name = ?", (table,)).fetchone()
+            if stored is None:
+                where = f"rid = 1 OR ({condition})" if condition else "1"
+                building = f"{table}_{uuid.uuid4().hex[:8]}"
+                connection.execute(f"CREATE TABLE {building} (rid INTEGER PRIMARY KEY)")
+                n_rows = connection.execute(f"INSERT INTO {building} SELECT rid FROM {MERGED} WHERE {where} "
+                                            f"ORDER BY rid", params).rowcount
+                try:
+                    connection.execute(f"ALTER TABLE {building} RENAME TO {table}")
+                    connection.execute("INSERT INTO selections VALUES (?, ?)", (table, n_rows))
+                except (sqlite3.IntegrityError, sqlite3.OperationalError):
+                    # Another session selected the same rows first
+                    connection.rollback()
+                    connection.execute(f"DROP TABLE IF EXISTS {building}")
+                connection.commit()
+            else:
+                n_rows = stored[0]
+        return DiskView(self, table, self.columns, n_rows)
+
+    def drop_selection(self, table):
+        """Drop the selection ``table`` (from an earlier ``select``) unless a view still reads it."""
+        if any(view.table == table and view.dataset.path == self.path for view in list(_open_views)):
+            return
+        with self.connect() as connection:
+            try:
+                connection.execute("DELETE FROM selections WHERE name = ?", (table,))
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+                connection.commit()
+            except sqlite3.OperationalError:
+                # Busy or read-only: the table stays until the database is evicted
+                connection.rollback()
+
+    def sample(self, rows=LAYOUT_SAMPLE_ROWS):
+        """Up to ``rows`` rows spread over the merged table (the sub-header row first), as a frame."""
+        step = max(1, self.n_rows // rows)
+        columns = ", ".join(f"m{j}" for j in range(len(self.columns)))
+        with self.connect() as connection:
+            cursor = connection.execute(f"SELECT {columns} FROM {MERGED} WHERE rid = 1 OR (rid - 1) % ? = 0 "
+                                        f"ORDER BY rid", (step,))
+            return pd.DataFrame(cursor.fetchall(), columns=self.columns, dtype=object)
+
+
+class _Connection:
+    """``connect`` as a context manager that closes the connection."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.connection = connect(self.path)
+        return self.connection
+
+    def __exit__(self, *exc_info):
+        self.connection.close()
+        return False
+
+
+class DiskView:
+    """Filtered rows of a ``DiskDataset`` (sub-header row first), read a window or a chunk at a time.
+
+    Stands in for the filtered frame: ``len``, ``shape`` and ``columns`` as for
+    a DataFrame, ``iter_chunks`` for the exporters and the PDF renderer.
+    """
+
+    def __init__(self, dataset, table, columns, n_rows):
+        self.dataset = dataset
+        self.table = table
+        self.columns = list(columns)
+        self.n_rows = n_rows
+        _open_views.add(self)
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def shape(self):
+        return self.n_rows, len(self.columns)
+
+    def with_columns(self, columns):
+        """The same rows with only ``columns``, in that order."""
+        unknown = [column for column in columns if column not in self.dataset.columns]
+        if unknown:
+            raise KeyError(f"Unknown columns: {', '.join(map(str, unknown))}")
+        return DiskView(self.dataset, self.table, columns, self.n_rows) if list(columns) != self.columns else self
+
+    def _select(self, columns=None):
+        columns = self.columns if columns is None else columns
+        return ", ".join(f"m.m{self.dataset.columns.index(column)}" for column in columns)
+
+    def _frame(self, rows, columns=None):
+        return pd.DataFrame(rows, columns=self.columns if columns is None else columns, dtype=object)
+
+    def head(self, rows):
+        with self.dataset.connect() as connection:
+            return self._frame(connection.execute(
+                f"SELECT {self._select()} FROM {self.table} s JOIN {MERGED} m ON m.rid = s.rid "
+                f"ORDER BY s.rid LIMIT ?", (rows,)).fetchall())
+
+    def iter_chunks(self, chunk_rows=None):
+        """The rows in order as frames of ``chunk_rows`` rows (missing cells None)."""
+        chunk_rows = chunk_rows or ENGINE_CHUNK_ROWS
+        with self.dataset.connect() as connection:
+            cursor = connection.execute(f"SELECT {self._select()} FROM {self.table} s JOIN {MERGED} m "
+                                        f"ON m.rid = s.rid ORDER BY s.rid")
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield self._frame(rows)
+
+
+class DiskFeed:
+    """Sorted, paged reads of a ``DiskView`` for the grid, with the interface of ``grid_view.GridFeed``.
+
+    The sub-header row is shown at the top of every window and left out of sorting.
+    """
+
+    def __init__(self, view):
+        self.view = view
+
+    @property
+    def n_rows(self):
+        return max(0, len(self.view) - 1)
+
+    @property
+    def window_size(self):
+        return GRID_PAGE_SIZE * (1 + GRID_PREFETCH_PAGES)
+
+    @property
+    def n_windows(self):
+        return max(1, -(-self.n_rows // self.window_size))
+
+    def window(self, columns, window, sort_by=None, ascending=True):
+        """Rows of ``window`` (0-based) in display order, the sub-header row first, as a frame."""
+        view = self.view
+        select = view._select(columns)
+        if sort_by is None:
+            order = "s.rid"
+        else:
+            column = f"m.m{view.dataset.columns.index(sort_by)}"
+            # Cells are stored as text: numeric columns sort by value
+            value = f"CAST({column} AS REAL)" if view.dataset.column(sort_by).sorts_numeric else column
+            # Empty cells last, ties in row order, as the stable pandas sort does
+            order = f"{column} IS NULL, {value}{'' if ascending else ' DESC'}, s.rid"
+        with view.dataset.connect() as connection:
+            pinned = connection.execute(f"SELECT {select} FROM {view.table} s JOIN {MERGED} m ON m.rid = s.rid "
+                                        f"WHERE s.rid = 1").fetchall()
+            body = connection.execute(f"SELECT {select} FROM {view.table} s JOIN {MERGED} m ON m.rid = s.rid "
+                                      f"WHERE s.rid != 1 ORDER BY {order} LIMIT ? OFFSET ?",
+                                      (self.window_size, window * self.window_size)).fetchall()
+        return view._frame(pinned + body, columns)
@@ -0,0 +1,125 @@
+"""Tabular exports of the filtered table: CSV, Excel and Parquet.
+
+Exports are written to a file ``EXPORT_CHUNK_ROWS`` rows at a time, so only
+one chunk is ever converted at once, however many rows are exported:
+
+    csv      ``to_csv`` of each chunk, appended to the file
+    xlsx     an openpyxl write-only workbook, rows appended as they are produced
+    parquet  one row group per chunk through a ``pyarrow.parquet.ParquetWriter``
+
+``export_bytes`` writes the file into the artifact store under the export's
+key, so it is only built when a download is requested and repeated requests
+are served from the stored file.
+"""
+import os
+from dataclasses import dataclass
+
+from artifacts import artifact_store
+from normalize import STRING_DTYPE, blank_missing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports are not offered without pyarrow
+    pa = None
+
+# Rows converted and written at a time
+EXPORT_CHUNK_ROWS = int(os.environ.get("MERGE_TABLE_EXPORT_CHUNK_ROWS", "50000"))
+
+# Rows an Excel sheet can hold, the header row included
+XLSX_MAX_ROWS = 1048576
+
+
+def csv_frame(df):
+    """``df`` laid out for the CSV download: missing values as a blank and 'Unnamed' headers left blank."""
+    df = blank_missing(df, " ")
+    df.columns = [col if "Unnamed" not in col else " " for col in df.columns]
+    return df
+
+
+def chunks(df, chunk_rows=None):
+    """Consecutive row slices of ``df`` (at least one, so the header is always written).
+
+    A ``disk_engine.DiskView`` is read from its database a chunk at a time
+    (``ENGINE_CHUNK_ROWS`` rows unless ``chunk_rows`` is given).
+    """
+    if hasattr(df, 'iter_chunks'):
+        empty = True
+        for chunk in df.iter_chunks(chunk_rows):
+            empty = False
+            yield chunk
+        if empty:
+            yield df.head(0)
+        return
+    chunk_rows = chunk_rows or EXPORT_CHUNK_ROWS
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df, f, chunk_rows=None):
+    """Write ``df`` as CSV to the binary file ``f``, laid out by ``csv_frame``."""
+    for i, chunk in enumerate(chunks(df, chunk_rows)):
+        csv_frame(chunk).to_csv(f, header=i == 0, index=False)
+
+
+def write_xlsx(df, f, chunk_rows=None):
+    """Write ``df`` as a one-sheet workbook to ``f``; missing values are left as empty cells."""
+    from openpyxl import Workbook
+
+    if len(df) + 1 > XLSX_MAX_ROWS:
+        raise ValueError(f"{len(df)} rows do not fit on an Excel sheet ({XLSX_MAX_ROWS - 1} at most)")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([col if "Unnamed" not in col else None for col in df.columns])
+    for chunk in chunks(df, chunk_rows):
+        cells = chunk.astype(object)
+        for row in cells.where(cells.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(f)
+
+
+def parquet_chunk(chunk):
+    """``chunk`` with object columns (mixed types after grid edits) as text, since Parquet columns have one type."""
+    chunk = chunk.copy(deep=False)
+    for position in range(chunk.shape[1]):
+        if chunk.dtypes.iloc[position] == object:
+            chunk.isetitem(position, chunk.iloc[:, position].astype(STRING_DTYPE))
+    return chunk
+
+
+def write_parquet(df, f, chunk_rows=None):
+    """Write ``df`` as a Parquet file to ``f``, one row group per chunk."""
+    writer = None
+    try:
+        for chunk in chunks(df, chunk_rows):
+            table = pa.Table.from_pandas(parquet_chunk(chunk), preserve_index=False,
+                                         schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(f, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    label: str
+    extension: str
+    mime: str
+    write: object  # write(df, f) writes the export of df to the binary file f
+
+
+EXPORT_FORMATS = {
+    'csv': ExportFormat("CSV", 'csv', 'text/csv', write_csv),
+    'xlsx': ExportFormat("Excel", 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                         write_xlsx),
+}
+if pa is not None:
+    EXPORT_FORMATS['parquet'] = ExportFormat("Parquet", 'parquet', 'application/vnd.apache.parquet', write_parquet)
+
+
+def export_bytes(df, fmt, key):
+    """The ``fmt`` export of ``df``, written in chunks and kept in the artifact store under ``key``."""
+    export_format = EXPORT_FORMATS[fmt]
+    return artifact_store.get_or_write(key, export_format.extension, lambda f: export_format.write(df, f))
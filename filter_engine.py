@@ -0,0 +1,149 @@
+"""Indexed row filtering for the sidebar filters.
+
+Each filtered column gets a lookup structure built once per dataset and
+reused on every rerun: text-like columns are factorized into integer codes
+with the row positions of each code stored contiguously, numeric columns
+keep a sorted order for ``searchsorted`` range lookups. A predicate then
+costs a slice of a precomputed array instead of a scan over the frame, and
+predicates on several columns are combined by intersecting row positions.
+Indexes are held in the ``data_manager`` next to the datasets they index.
+"""
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from data_manager import data_manager
+
+# Memory of a categories list entry and its lookup, on top of the value itself
+CATEGORY_BYTES = 100
+
+
+class ColumnIndex:
+    """Row positions of one column, grouped by value (categorical) or sorted (range)."""
+
+    def __init__(self, values):
+        values = pd.Series(values).reset_index(drop=True)
+        self.is_range = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+        if self.is_range:
+            numbers = values.to_numpy(dtype=float, na_value=np.nan)
+            order = np.argsort(numbers, kind='stable')  # NaNs sort last
+            valid = int(np.count_nonzero(~np.isnan(numbers)))
+            self.order = order[:valid]
+            self.sorted_values = numbers[self.order]
+        else:
+            codes, self.categories = pd.factorize(values, sort=False)
+            order = np.argsort(codes, kind='stable')
+            # Positions of code c are order[starts[c]:starts[c + 1]]; missing values (-1) come first
+            self.starts = np.searchsorted(codes[order], np.arange(len(self.categories) + 1))
+            self.order = order
+            self.categories = self.categories.tolist()
+            self._code_of = {value: code for code, value in enumerate(self.categories)}
+
+    @property
+    def nbytes(self):
+        arrays = [self.order] + ([self.sorted_values] if self.is_range else [self.starts])
+        return sum(array.nbytes for array in arrays) + CATEGORY_BYTES * (0 if self.is_range else len(self.categories))
+
+    @property
+    def min(self):
+        return float(self.sorted_values[0]) if len(self.sorted_values) else 0.0
+
+    @property
+    def max(self):
+        return float(self.sorted_values[-1]) if len(self.sorted_values) else 0.0
+
+    def isin(self, selected):
+        """Sorted row positions whose value is one of ``selected``."""
+        codes = [self._code_of[value] for value in selected if value in self._code_of]
+        if not codes:
+            return np.empty(0, dtype=np.intp)
+        parts = [self.order[self.starts[code]:self.starts[code + 1]] for code in codes]
+        return np.sort(np.concatenate(parts))
+
+    def between(self, low, high):
+        """Sorted row positions with ``low <= value <= high``."""
+        start = np.searchsorted(self.sorted_values, low, side='left')
+        stop = np.searchsorted(self.sorted_values, high, side='right')
+        return np.sort(self.order[start:stop])
+
+
+class FilterIndex:
+    """Lazily built column indexes for one dataset.
+
+    The frame is only referenced weakly, so a cached index does not keep a
+    frame the ``data_manager`` has evicted in memory.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.n_rows = len(df)
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    @property
+    def df(self):
+        return self._df()
+
+    @df.setter
+    def df(self, df):
+        self._df = weakref.ref(df)
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(index.nbytes for index in self._columns.values())
+
+    def column(self, name):
+        with self._lock:
+            index = self._columns.get(name)
+            if index is None:
+                if name not in self.df.columns:
+                    raise KeyError(f"Unknown filter column: {name!r}")
+                position = self.df.columns.get_loc(name)
+                index = self._columns[name] = ColumnIndex(self.df.iloc[:, position])
+            return index
+
+    def select(self, predicates):
+        """Row positions matching every predicate (AND across columns).
+
+        ``predicates`` maps a column name to either a collection of accepted
+        values (OR within the column) or a ``(low, high)`` range tuple for
+        numeric columns. Empty collections do not filter.
+        """
+        positions = None
+        for name, condition in predicates.items():
+            index = self.column(name)
+            if index.is_range:
+                matched = index.between(*condition)
+            elif condition:
+                matched = index.isin(condition)
+            else:
+                continue
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+        if positions is None:
+            return np.arange(self.n_rows)
+        return positions
+
+
+def filter_index(dataset_key, df):
+    """Return the cached ``FilterIndex`` for ``dataset_key``, building it for ``df`` on first use."""
+    key = f"{dataset_key}:filter"
+    index = data_manager.get(key)
+    if index is None or index.n_rows != len(df):
+        index = FilterIndex(df)
+    else:
+        # Keep the latest frame so lazily built columns see this rerun's values
+        index.df = df
+    # Put back on every rerun, sized with the columns indexed so far
+    data_manager.put(key, index, nbytes=index.nbytes)
+    return index
+
+
+def filter_positions(index, predicates, pinned_rows=1):
+    """Sorted row positions kept by ``predicates``, always including the first ``pinned_rows`` rows."""
+    positions = index.select(predicates)
+    if pinned_rows:
+        positions = np.union1d(np.arange(min(pinned_rows, index.n_rows)), positions)
+    return positions
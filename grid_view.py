@@ -0,0 +1,209 @@
+"""Windowed data feed for the AgGrid view.
+
+Only a window of rows (the visible grid page plus a few prefetched pages) is
+serialized to the browser. Sorting and paging happen here against the frame
+kept on the server; sort orders are computed once per view, column and
+direction and kept in the ``data_manager``, shared by sessions showing the
+same view.
+
+Edits made in the grid are recorded as a change log of single cells and
+applied to the session's frame, rather than rebuilding the frame from the
+returned JSON. Edited columns are copied first, so frames shared with other
+sessions are never written to.
+"""
+from collections import defaultdict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from data_manager import data_manager
+
+# Hidden grid column carrying each row's position in the full frame
+ROW_ID = "__row"
+
+GRID_PAGE_SIZE = 20
+# Pages sent in addition to the visible one, so paging inside a window needs no rerun
+GRID_PREFETCH_PAGES = 4
+
+
+class GridFeed:
+    """Sorted, paged access to ``df`` for one filtered view.
+
+    ``view_key`` identifies the rows of ``df`` (filters and edits included),
+    since sort orders are cached under it. The first ``pinned_rows`` rows (the
+    sub-header row) are left out of sorting and shown at the top of every
+    window.
+    """
+
+    def __init__(self, view_key, df, pinned_rows=1):
+        self.view_key = view_key
+        self.df = df
+        self.pinned = np.arange(min(pinned_rows, len(df)))
+
+    @property
+    def n_rows(self):
+        return len(self.df) - len(self.pinned)
+
+    @property
+    def window_size(self):
+        return GRID_PAGE_SIZE * (1 + GRID_PREFETCH_PAGES)
+
+    @property
+    def n_windows(self):
+        return max(1, -(-self.n_rows // self.window_size))
+
+    def order(self, sort_by=None, ascending=True):
+        """Row positions (excluding pinned rows) in display order, cached per column and direction."""
+        start = len(self.pinned)
+        if sort_by is None:
+            return np.arange(start, len(self.df))
+        key = f"{self.view_key}:order:{sort_by}:{ascending}"
+        order = data_manager.get(key)
+        if order is None:
+            values = self.df.iloc[start:, list(self.df.columns).index(sort_by)].reset_index(drop=True)
+            values = numeric_sort_values(values)
+            try:
+                ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+            except TypeError:
+                # Mixed types in an object column: fall back to sorting their text
+                ordered = values.astype(str).sort_values(ascending=ascending, kind='stable')
+            order = start + ordered.index.to_numpy()
+            data_manager.put(key, order)
+        return order
+
+    def positions(self, window, sort_by=None, ascending=True):
+        """Frame positions shown in ``window`` (0-based), pinned rows first."""
+        start = window * self.window_size
+        body = self.order(sort_by, ascending)[start:start + self.window_size]
+        return np.concatenate([self.pinned, body])
+
+    def window(self, columns, window, sort_by=None, ascending=True):
+        """The slice of ``df`` to hand to AgGrid, with ``ROW_ID`` as the last column."""
+        positions = self.positions(window, sort_by, ascending)
+        view = self.df.iloc[positions][columns]
+        view.insert(len(view.columns), ROW_ID, positions)
+        return view.reset_index(drop=True)
+
+
+def numeric_sort_values(values):
+    """``values`` as numbers when every non-missing text value parses as one, so "10" sorts after "9"."""
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
+            or isinstance(values.dtype, pd.CategoricalDtype)):
+        return values
+    present = values.notna().sum()
+    try:
+        numbers = pd.to_numeric(values.astype(object), errors='coerce')
+    except TypeError:
+        return values
+    if not present or numbers.notna().sum() != present:
+        return values
+    return numbers
+
+
+CellEdit = namedtuple('CellEdit', 'row column old new')  # row: position in the unfiltered frame
+
+
+class EditLog:
+    """Cell edits made in the grid for one dataset, replayed onto each rerun's filtered frame.
+
+    Edits are keyed by row position in the unfiltered (merged) frame, so they
+    survive changes to the filters, sorting and grid window.
+    """
+
+    def __init__(self, dataset_key):
+        self.dataset_key = dataset_key
+        self.edits = []
+
+    def apply(self, df, source_positions, edits=None):
+        """Write ``edits`` (default: all of them) into ``df`` in place.
+
+        Row ``i`` of ``df`` is row ``source_positions[i]`` of the unfiltered frame;
+        edits to rows that are filtered out are skipped.
+        """
+        edits = self.edits if edits is None else edits
+        by_column = defaultdict(dict)
+        for edit in edits:
+            i = np.searchsorted(source_positions, edit.row)
+            if i < len(source_positions) and source_positions[i] == edit.row:
+                by_column[edit.column][i] = edit.new  # later edits of a cell win
+        for column, cells in by_column.items():
+            if column in df.columns:
+                set_cells(df, column, list(cells), list(cells.values()))
+
+    def record(self, df, source_positions, returned):
+        """Diff the rows AgGrid returned against ``df``, then log and apply the changes.
+
+        Only the returned window is compared, so a rerun without edits costs
+        a comparison of a few dozen rows. Returns the new edits.
+        """
+        if returned is None or len(returned) == 0 or ROW_ID not in returned.columns:
+            return []
+        rows = returned[ROW_ID].to_numpy(dtype=int)
+        new_edits = []
+        for column in returned.columns:
+            if column == ROW_ID or column not in df.columns or not isinstance(df.columns.get_loc(column), int):
+                continue
+            current = df[column].iloc[rows].reset_index(drop=True)
+            incoming = returned[column].reset_index(drop=True)
+            for i in np.flatnonzero(~same_values(current, incoming)):
+                new_edits.append(CellEdit(int(source_positions[rows[i]]), column, current.iloc[i], incoming.iloc[i]))
+        if new_edits:
+            self.edits.extend(new_edits)
+            self.apply(df, source_positions, new_edits)
+        return new_edits
+
+
+def same_values(current, incoming):
+    """Element-wise equality that tolerates the type changes of a JSON round trip."""
+    both_missing = current.isna().to_numpy() & incoming.isna().to_numpy()
+    same_text = current.astype(str).to_numpy() == incoming.astype(str).to_numpy()
+    # Nullable (Arrow string) columns compare to NA where a side is missing
+    same_number = (pd.to_numeric(current, errors='coerce') == pd.to_numeric(incoming, errors='coerce')).to_numpy(
+        dtype=bool, na_value=False)
+    return both_missing | same_text | same_number
+
+
+def set_cells(df, column, rows, values):
+    """Assign ``values`` at row positions ``rows`` of ``column``, copying that column only.
+
+    ``df`` may share its other columns with frames of other sessions.
+    """
+    position = df.columns.get_loc(column)
+    current = df.iloc[:, position]
+    updated = None
+    if isinstance(current.dtype, pd.CategoricalDtype):
+        # New values become categories, so the column stays categorical
+        added = pd.Index(values).dropna().unique().difference(current.cat.categories, sort=False)
+        updated = current.cat.add_categories(added) if len(added) else current.copy()
+    elif current.dtype != object:
+        try:
+            values = pd.array(pd.to_numeric(values) if current.dtype.kind in 'iuf' else values, dtype=current.dtype)
+        except (ValueError, TypeError):
+            # The edit does not fit the column's type (e.g. text in a number column)
+            updated = current.astype(object)
+    if updated is None:
+        updated = current.copy()
+    updated.iloc[rows] = values
+    df.isetitem(position, updated)
+
+
+def edit_log(state, dataset_key):
+    """The session's ``EditLog``, started afresh when a different dataset is loaded."""
+    log = state.get('grid_edits')
+    if log is None or log.dataset_key != dataset_key:
+        log = EditLog(dataset_key)
+        state['grid_edits'] = log
+    return log
+
+
+def window_label(feed, window):
+    start = window * feed.window_size + 1
+    stop = min(start + feed.window_size - 1, feed.n_rows)
+    return f"Rows {start}-{stop} of {feed.n_rows}"
+
+
+def rows_to_frame(data):
+    """AgGrid's returned rows as a DataFrame (it may hand back records or a frame)."""
+    if data is None:
+        return None
+    return data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
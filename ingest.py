@@ -0,0 +1,100 @@
+"""Reading uploaded CSV/Excel files into DataFrames.
+
+Streamlit reruns the whole script on every widget interaction, so parsed
+frames are kept in the process-wide ``data_manager`` keyed on a hash of the
+file bytes plus the read options. Unchanged uploads are parsed once per
+server process and shared across reruns and sessions.
+
+Frames are also written to the on-disk store in ``disk_cache``, so they
+survive server restarts and memory evictions. Remaining misses are parsed in
+a pool of worker processes, so a batch of workbooks takes about as long as
+the slowest one. Excel files are read with the calamine engine when
+``python-calamine`` is installed; otherwise pandas falls back to openpyxl,
+which it already opens read-only with values only.
+"""
+import hashlib
+from importlib.util import find_spec
+from io import BytesIO
+
+import pandas as pd
+
+from data_manager import data_manager
+from disk_cache import frame_store
+from workers import process_pool, worker_count
+
+# Worker processes used to parse uploads in parallel (0 = one per CPU, 1 = parse in-process)
+PARSE_WORKERS = worker_count("MERGE_TABLE_PARSE_WORKERS")
+
+FAST_EXCEL_ENGINE = 'calamine' if find_spec('python_calamine') is not None else None
+
+
+def content_key(data, **options):
+    """Hash of the raw file bytes plus the options used to read them."""
+    digest = hashlib.sha256(data)
+    digest.update(repr(sorted(options.items())).encode())
+    return digest.hexdigest()
+
+
+def parse_file(name, data, **options):
+    """Parse raw file bytes with pandas, choosing the reader from the file name."""
+    if name.endswith('.csv'):
+        return pd.read_csv(BytesIO(data), **options)
+    return pd.read_excel(BytesIO(data), **options)
+
+
+def read_options(name, **options):
+    """Fill in the fastest available Excel engine unless the caller picked one."""
+    if name.endswith(('.xlsx', '.xlsm')) and FAST_EXCEL_ENGINE and 'engine' not in options:
+        options['engine'] = FAST_EXCEL_ENGINE
+    return options
+
+
+def cache_key(name, data, **options):
+    kind = 'csv' if name.endswith('.csv') else 'excel'
+    return content_key(data, kind=kind, **options)
+
+
+def upload_key(name, data, **options):
+    """Content key of an upload read with ``options`` (and the Excel engine ``read_options`` picks)."""
+    return cache_key(name, data, **read_options(name, **options))
+
+
+def read_uploaded_files(files, **options):
+    """Parse ``(name, data)`` pairs, returning ``(frames, keys)`` in the same order.
+
+    Files cached in memory or on disk are served directly; the rest are parsed
+    concurrently in the worker pool when there is more than one of them. The
+    content keys identify the parsed frames for downstream caches.
+    """
+    keys = []
+    frames = []
+    misses = []
+    for i, (name, data) in enumerate(files):
+        file_options = read_options(name, **options)
+        key = upload_key(name, data, **options)
+        df = data_manager.get(key)
+        if df is None:
+            stored = frame_store.get(key)
+            if stored is not None:
+                df = stored[0]
+                data_manager.put(key, df)
+        keys.append(key)
+        frames.append(df)
+        if df is None:
+            misses.append((i, name, data, file_options))
+
+    if len(misses) > 1 and PARSE_WORKERS > 1:
+        pool = process_pool('parse', PARSE_WORKERS)
+        futures = [(i, pool.submit(parse_file, name, data, **file_options))
+                   for i, name, data, file_options in misses]
+        parsed = [(i, future.result()) for i, future in futures]
+    else:
+        parsed = [(i, parse_file(name, data, **file_options)) for i, name, data, file_options in misses]
+
+    for i, df in parsed:
+        data_manager.put(keys[i], df)
+        frame_store.put(keys[i], df)
+        frames[i] = df
+
+    # Shallow copies, so assigning columns does not alter the cached frames
+    return [df.copy(deep=False) for df in frames], keys
@@ -0,0 +1,254 @@
+"""Single-pass inner join of many uploaded frames on a shared key column.
+
+Rather than chaining ``pd.merge`` (which builds N-1 intermediate frames and
+re-validates the key on each step), every frame is indexed on the key once,
+the key sets are intersected in one pass and each frame contributes a single
+``take`` to the final ``concat``. The result has the same rows, row order and
+column names as the chained ``pd.merge(..., how="inner", validate="1:1")``.
+
+``join_uploads`` keys the result on the content hashes of its inputs and
+keeps it in the ``data_manager`` and the on-disk frame cache.
+
+``prepare_uploads`` gives each upload's compact frame (see ``normalize``) and
+key index, prepared once per file and cached under the upload's content key;
+a file is only parsed (or reloaded from the disk cache) when they are not
+held. ``merge_uploads`` joins them, so adding a file to an upload list
+prepares just that file, and removing one only recomputes the key
+intersection; no other file is read or converted again.
+"""
+import hashlib
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+
+import pandas as pd
+
+from data_manager import data_manager, frame_nbytes
+from disk_cache import frame_store
+from ingest import read_uploaded_files, upload_key
+from normalize import ColumnUsage, normalize_frame
+
+
+@dataclass
+class JoinReport:
+    """What happened to one input frame during the join."""
+    name: str
+    rows: int = 0
+    missing_key_column: bool = False
+    duplicate_keys: list = field(default_factory=list)  # key values that occur more than once
+    unmatched_rows: int = 0  # rows dropped because their key is not in every other file
+
+    @property
+    def skipped(self):
+        return self.missing_key_column or bool(self.duplicate_keys)
+
+    def message(self, key_column):
+        if self.missing_key_column:
+            return f"Key column '{key_column}' not found in {self.name}."
+        if self.duplicate_keys:
+            sample = ", ".join(map(str, self.duplicate_keys[:5]))
+            return (f"{self.name} has {len(self.duplicate_keys)} duplicate value(s) in key column "
+                    f"'{key_column}' (e.g. {sample}); the file was left out of the merge.")
+        if self.unmatched_rows:
+            return f"{self.rows - self.unmatched_rows} of {self.rows} rows of {self.name} matched all other files."
+        return f"All {self.rows} rows of {self.name} matched."
+
+
+def merged_column_names(frames, key_column):
+    """Column names that chained ``pd.merge`` calls would produce, including suffixes.
+
+    Merging zero-row slices is enough to get the layout and costs nothing. When
+    the chain would fail because three or more files share a column name, the
+    colliding columns are numbered by file instead.
+    """
+    empties = [df.iloc[:0].astype({key_column: object}) for df in frames]
+    layout = empties[0]
+    try:
+        for df in empties[1:]:
+            layout = pd.merge(layout, df, on=key_column, how="inner")
+        return layout.columns.tolist()
+    except pd.errors.MergeError:
+        pass
+
+    labelled = [(col, 1) for col in frames[0].columns]
+    for i, df in enumerate(frames[1:], start=2):
+        labelled.extend((col, i) for col in df.columns if col != key_column)
+    counts = Counter(col for col, _ in labelled)
+    return [col if col == key_column or counts[col] == 1 else f"{col}_{i}" for col, i in labelled]
+
+
+def key_index(df, key_column):
+    """The keys of ``df`` as text, in an Index whose hash table serves every join; None without the key column."""
+    if key_column not in df.columns:
+        return None
+    return pd.Index(df[key_column].astype(str))
+
+
+def multi_way_join(frames, names=None, key_column=None, key_indexes=None):
+    """Inner-join ``frames`` on ``key_column`` (default: first column of the first frame).
+
+    Returns ``(merged_df, reports)`` with one ``JoinReport`` per input frame.
+    Frames without the key column or with duplicate keys are reported and left
+    out, instead of aborting the whole merge. ``key_indexes`` are the frames'
+    prepared ``key_index``; frames passed with them already hold their key
+    column as text and keep it as it is.
+    """
+    if names is None:
+        names = [f"file {i + 1}" for i in range(len(frames))]
+    if key_column is None:
+        key_column = frames[0].columns[0]
+    prepared_keys = key_indexes is not None
+    if not prepared_keys:
+        key_indexes = [key_index(df, key_column) for df in frames]
+
+    reports = [JoinReport(name=name, rows=len(df)) for df, name in zip(frames, names)]
+    used_frames = []
+    used_keys = []
+    used_reports = []
+    for df, keys, report in zip(frames, key_indexes, reports):
+        if keys is None:
+            report.missing_key_column = True
+            continue
+        if not keys.is_unique:
+            report.duplicate_keys = keys[keys.duplicated()].unique().tolist()
+            continue
+        used_frames.append(df)
+        used_keys.append(keys)
+        used_reports.append(report)
+
+    if not used_frames:
+        return pd.DataFrame(columns=[key_column]), reports
+
+    # Intersect the key sets in one pass, keeping the row order of the first frame like pd.merge does.
+    # Lookups go through each index's own hash table, which the uniqueness check already built.
+    common = used_keys[0]
+    for keys in used_keys[1:]:
+        common = common[keys.get_indexer(common) != -1]
+
+    pieces = []
+    for i, (df, keys, report) in enumerate(zip(used_frames, used_keys, used_reports)):
+        report.unmatched_rows = len(keys) - len(common)
+        positions = keys.get_indexer(common)
+        if i == 0:
+            # The first frame keeps its key column (as strings) in place, exactly like pd.merge's left side
+            piece = df.take(positions).reset_index(drop=True)
+            if not prepared_keys:
+                piece[key_column] = common.to_numpy()
+        else:
+            piece = df.drop(columns=[key_column]).take(positions).reset_index(drop=True)
+        pieces.append(piece)
+
+    merged_df = pd.concat(pieces, axis=1, copy=False)
+    merged_df.columns = merged_column_names(used_frames, key_column)
+    return merged_df, reports
+
+
+def join_key(upload_keys, key_column):
+    digest = hashlib.sha256(b'join')
+    for key in upload_keys:
+        digest.update(key.encode())
+    digest.update(repr(key_column).encode())
+    return digest.hexdigest()
+
+
+def join_uploads(frames, names, upload_keys, key_column=None, key_indexes=None):
+    """``multi_way_join`` with the result cached on the inputs' content keys."""
+    if key_column is None:
+        key_column = frames[0].columns[0]
+    key = join_key(upload_keys, key_column)
+
+    cached = data_manager.get(key)
+    if cached is None:
+        stored = frame_store.get(key)
+        if stored is not None:
+            merged_df, metadata = stored
+            reports = [JoinReport(**report) for report in metadata.get('reports', [])]
+        else:
+            merged_df, reports = multi_way_join(frames, names, key_column, key_indexes)
+            frame_store.put(key, merged_df, reports=[asdict(report) for report in reports])
+        cached = (merged_df, reports)
+        data_manager.put(key, cached, nbytes=frame_nbytes(merged_df))
+
+    merged_df, reports = cached
+    # File names may differ between uploads of identical content
+    reports = [JoinReport(**{**asdict(report), 'name': name}) for report, name in zip(reports, names)]
+    return merged_df.copy(deep=False), reports
+
+
+@dataclass
+class CompactUpload:
+    """One upload prepared for merging: its compact frame, memory usage and key index."""
+    df: pd.DataFrame
+    usage: ColumnUsage
+    keys: pd.Index = None
+
+
+def compact_key(upload_key, key_column=None):
+    """Data manager key of an upload's ``CompactUpload``; ``None`` stands for the upload's own first column."""
+    return f"{upload_key}:compact" if key_column is None else f"{upload_key}:compact:{key_column}"
+
+
+def compact_upload(df, upload_key, key_column):
+    """``df`` in compact column types with its key index, prepared once per upload and key column."""
+    own_key = len(df.columns) > 0 and key_column == df.columns[0]
+    cache_key = compact_key(upload_key, None if own_key else key_column)
+    upload = data_manager.get(cache_key)
+    if upload is None:
+        position = df.columns.get_loc(key_column) if key_column in df.columns else None
+        compact_df, usage = normalize_frame(df, key_column=position)
+        upload = CompactUpload(compact_df, usage, key_index(df, key_column))
+        keys_bytes = upload.keys.memory_usage(deep=True) if upload.keys is not None else 0
+        data_manager.put(cache_key, upload, nbytes=usage.after_bytes + keys_bytes)
+    return upload
+
+
+def prepare_uploads(files, **options):
+    """``(uploads, upload_keys)``: the ``CompactUpload`` of each ``(name, data)`` file, keyed on its first column.
+
+    Uploads already prepared are taken from the ``data_manager``; only the
+    others are parsed (or reloaded from the disk cache), in parallel. Their
+    parsed frames are released from the ``data_manager`` once converted, so
+    the budget holds the compact forms the merge uses.
+    """
+    keys = [upload_key(name, data, **options) for name, data in files]
+    uploads = [data_manager.get(compact_key(key)) for key in keys]
+    missing = [i for i, upload in enumerate(uploads) if upload is None]
+    if missing:
+        frames, _ = read_uploaded_files([files[i] for i in missing], **options)
+        for i, df in zip(missing, frames):
+            uploads[i] = compact_upload(df, keys[i], df.columns[0] if len(df.columns) else None)
+            # Only the compact form is used from here on; the parsed frame stays in the disk cache
+            data_manager.release(keys[i])
+    return uploads, keys
+
+
+def merge_uploads(uploads, names, upload_keys, files, **options):
+    """Merge prepared uploads the way the home page does, returning ``(merged_df, dataset_key, reports, usage)``.
+
+    Several uploads are joined on the first column of the first one; a
+    single upload is used as it is. An upload whose own first column is
+    another one is prepared again on the key, parsing its entry of ``files``
+    unless that is held too. ``usage`` adds up the memory the compact
+    column types saved.
+    """
+    key_column = uploads[0].df.columns[0]
+    uploads = list(uploads)
+    for i, upload in enumerate(uploads):
+        if upload.df.columns[0] != key_column:
+            keyed = data_manager.get(compact_key(upload_keys[i], key_column))
+            if keyed is None:
+                (df,), _ = read_uploaded_files([files[i]], **options)
+                keyed = compact_upload(df, upload_keys[i], key_column)
+                data_manager.release(upload_keys[i])
+            uploads[i] = keyed
+    usage = ColumnUsage.total(upload.usage for upload in uploads)
+    if len(uploads) > 1:
+        # Join every file on the first column of the first one in a single pass
+        merged_df, reports = join_uploads([upload.df for upload in uploads], names, upload_keys, key_column,
+                                          [upload.keys for upload in uploads])
+        dataset_key = join_key(upload_keys, key_column)
+    else:
+        # Single DataFrame case
+        merged_df = uploads[0].df.copy(deep=False)
+        dataset_key = upload_keys[0]
+        reports = []
+    return merged_df, dataset_key, reports, usage
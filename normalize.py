@@ -0,0 +1,113 @@
+"""Compact column types for merged frames, and the text shown for their cells.
+
+Because of the sub-header row, pandas reads most upload columns as object
+columns holding a Python object per cell: strings from CSV files, numbers
+from Excel. ``normalize_frame`` stores every column in the most compact type
+that keeps the text of its cells:
+
+    typed columns       kept as they are (numbers, dates)
+    repetitive text     categorical (one code per cell, each value stored once)
+    other text          Arrow-backed strings (a single buffer per column)
+
+Missing cells stay missing instead of being rewritten as '' across the whole
+frame; ``text_rows`` and ``blank_missing`` turn them into blanks for the
+cells that are displayed or exported.
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+from data_manager import frame_nbytes
+
+try:
+    import pyarrow  # noqa: F401  (backs the string dtype)
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    STRING_DTYPE = pd.StringDtype('python')
+
+# Text columns with at most this many distinct values per cell become categoricals
+CATEGORY_RATIO = 0.5
+
+
+@dataclass
+class ColumnUsage:
+    """Memory of a dataset before and after ``normalize_frame``, and the types chosen."""
+    before_bytes: int = 0
+    after_bytes: int = 0
+    typed: int = 0
+    categorical: int = 0
+    strings: int = 0
+
+    @classmethod
+    def total(cls, usages):
+        """Sum of ``usages`` (of the uploads making up one dataset)."""
+        total = cls()
+        for usage in usages:
+            for name in ('before_bytes', 'after_bytes', 'typed', 'categorical', 'strings'):
+                setattr(total, name, getattr(total, name) + getattr(usage, name))
+        return total
+
+    @property
+    def saved_bytes(self):
+        return self.before_bytes - self.after_bytes
+
+    def message(self):
+        saved = self.saved_bytes / self.before_bytes if self.before_bytes else 0.0
+        return (f"Data held in {self.after_bytes / 1e6:.1f} MB instead of {self.before_bytes / 1e6:.1f} MB "
+                f"({saved:.0%} saved): {self.typed} typed, {self.categorical} categorical "
+                f"and {self.strings} text column(s).")
+
+
+def compact_column(values, key=False):
+    """``values`` in its compact type; ``key`` columns become text with a trailing '.0' removed."""
+    if not key and values.dtype != object:
+        return values
+    # str of each value, missing cells kept missing
+    text = values.astype(STRING_DTYPE)
+    if key:
+        # Keys read from Excel come back as floats
+        text = text.str.replace(r'\.0$', '', regex=True)
+    if text.nunique() <= CATEGORY_RATIO * text.count():
+        return text.astype('category')
+    return text
+
+
+def normalize_frame(df, key_column=0):
+    """``df`` with compact column types and its ``ColumnUsage``.
+
+    ``key_column`` is the position of the column the uploads are joined on
+    (None if there is none).
+    Columns are converted one at a time, so at most one column is held twice.
+    """
+    usage = ColumnUsage(before_bytes=frame_nbytes(df))
+    df = df.copy(deep=False)
+    for position in range(df.shape[1]):
+        column = compact_column(df.iloc[:, position], key=position == key_column)
+        df.isetitem(position, column)
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            usage.categorical += 1
+        elif isinstance(column.dtype, pd.StringDtype):
+            usage.strings += 1
+        else:
+            usage.typed += 1
+    usage.after_bytes = frame_nbytes(df)
+    return df, usage
+
+
+def text_rows(df):
+    """Rows of ``df`` as lists of the text shown for each cell."""
+    cells = df.astype(object)
+    return [[str(item) for item in row] for row in cells.where(cells.notna(), '').values.tolist()]
+
+
+def blank_missing(df, blank=''):
+    """``df`` with missing cells replaced by ``blank``; columns with missing cells become object columns.
+
+    Meant for the slices being exported: each such column is copied.
+    """
+    df = df.copy(deep=False)
+    for position in range(df.shape[1]):
+        values = df.iloc[:, position]
+        if values.hasnans:
+            df.isetitem(position, values.astype(object).fillna(blank))
+    return df
@@ -0,0 +1,162 @@
+"""Background PDF exports.
+
+"Generate PDF" submits an ``ExportJob`` to a small thread pool shared by all
+sessions instead of rendering inside the script run, so the session stays
+responsive and the number of exports rendering at once on the server is
+capped (``EXPORT_JOBS``); further exports wait in the queue. Each job has an
+ID the session keeps, reports the pages rendered so far, and can be
+cancelled while queued or between pages.
+
+Rendered PDFs are kept in ``artifacts.artifact_store`` under the export's
+key and downloads read them from there; an export that is already stored
+finishes at once without queueing. Only a PDF the store cannot hold stays in
+memory with its job.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from artifacts import artifact_store
+from diagnostics import Trace
+from pdf_report import build_report, count_pages
+
+# Exports rendered at the same time across all sessions
+EXPORT_JOBS = int(os.environ.get("MERGE_TABLE_EXPORT_JOBS", "2"))
+# Finished jobs kept for download before the oldest are dropped
+MAX_KEPT_JOBS = 32
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class ExportCancelled(Exception):
+    """Raised from the progress callback to stop a cancelled export."""
+
+
+class ExportJob:
+    """One PDF export: its state, progress and, once done, where its PDF is read from."""
+
+    def __init__(self, filename, pages_total, cache_key=None, diagnostics=False):
+        self.id = uuid.uuid4().hex[:8]
+        self.filename = filename
+        self.status = QUEUED
+        self.pages_done = 0
+        self.pages_total = pages_total
+        self.submitted = time.time()
+        self.finished = None
+        self.cache_key = cache_key
+        self.result = None  # the PDF bytes, only when the artifact store could not hold them
+        self.error = None
+        self.future = None
+        self._cancel = threading.Event()
+        self.trace = Trace('export', enabled=diagnostics, job=self.id)
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def available(self):
+        """Whether the PDF of a finished job can still be downloaded (it may have been evicted)."""
+        return self.result is not None or (
+            self.cache_key is not None and artifact_store.size(self.cache_key, 'pdf') is not None)
+
+    def pdf(self):
+        """The PDF bytes, read from the artifact store; ``None`` once evicted."""
+        if self.result is not None:
+            return self.result
+        return artifact_store.get(self.cache_key, 'pdf') if self.cache_key else None
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    def progress(self, pages):
+        if self._cancel.is_set():
+            raise ExportCancelled(self.id)
+        self.pages_done = pages
+        # Blocks that overflow onto extra pages make the estimate too low
+        self.pages_total = max(self.pages_total, pages)
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+        self.trace.count(status=status, pages=self.pages_done)
+        self.trace.finish()
+
+    def run(self, df, header, column_pages, options):
+        if self._cancel.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self.trace.count(queued_seconds=round(time.time() - self.submitted, 3), rows=len(df) - 1,
+                         columns=df.shape[1], column_pages=len(column_pages), workers=options.workers)
+        buffer = BytesIO()
+        try:
+            with self.trace.stage('render'):
+                build_report(buffer, df, header, column_pages, options, progress=self.progress)
+        except ExportCancelled:
+            self._finish(CANCELLED)
+            return
+        except Exception as exc:
+            self.error = str(exc)
+            self._finish(FAILED)
+            return
+        data = buffer.getvalue()
+        self.trace.count(pdf_bytes=len(data))
+        stored = False
+        if self.cache_key:
+            with self.trace.stage('save'):
+                stored = artifact_store.put(self.cache_key, 'pdf', data)
+        if not stored:
+            self.result = data
+        self._finish(DONE)
+
+    def serve(self, size):
+        """Finish at once with the PDF already stored under the job's key (``size`` bytes)."""
+        self.pages_done = self.pages_total
+        self.trace.count(cached=True, pdf_bytes=size)
+        self._finish(DONE)
+
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_JOBS, thread_name_prefix="pdf-export")
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def submit_export(df, header, column_pages, options, filename, cache_key=None, diagnostics=False):
+    """Queue the export of ``df`` and return its ``ExportJob`` (traced when ``diagnostics`` is set).
+
+    With ``cache_key`` a PDF stored under that key is served without
+    rendering, and a rendered one is stored. ``df`` must not be modified
+    afterwards (each rerun builds a new filtered frame, so the one handed
+    over here is not touched again).
+    """
+    job = ExportJob(filename, count_pages(len(df), column_pages, options.row_page), cache_key, diagnostics)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        finished = [job_id for job_id, kept in _jobs.items() if not kept.active]
+        for job_id in finished[:max(0, len(_jobs) - MAX_KEPT_JOBS)]:
+            del _jobs[job_id]
+    stored_size = artifact_store.size(cache_key, 'pdf') if cache_key else None
+    if stored_size is not None:
+        job.serve(stored_size)
+        return job
+    job.future = _executor.submit(job.run, df, header, column_pages, options)
+    return job
+
+
+def get_job(job_id):
+    """The job with ``job_id``, or None once it has been dropped."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def queue_position(job):
+    """Number of jobs submitted before ``job`` that are still waiting to start."""
+    with _jobs_lock:
+        return sum(1 for other in _jobs.values() if other.status == QUEUED and other.submitted < job.submitted)
@@ -0,0 +1,187 @@
+"""Column layout of the PDF export.
+
+The table is wider than a page, so its columns are split into column pages,
+each of which after the first starts with the three key columns again. The
+planner works on column widths only and returns, for every column page, the
+positions of the source columns to show and their widths. Rendering slices
+the frame with that plan; nothing is inserted into or copied from the frame
+to repeat the key columns.
+
+Widths follow the content: every column is measured once per dataset and
+font size (``column_measurements``) and the measurements are clamped to the
+sizes entered in the export form.
+"""
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from reportlab.lib.pagesizes import A3, landscape
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from normalize import STRING_DTYPE
+from pdf_report import CELL_PADDING
+
+# Columns repeated at the start of every column page
+KEY_COLUMNS = 3
+
+# Longest values sampled per column to estimate the width of one character
+WIDTH_SAMPLE = 16
+# Share of a column's values that must fit on one line
+FIT_PERCENTILE = 95
+# Number of datasets whose column measurements are kept in memory
+MAX_MEASURED_DATASETS = 16
+
+# Define margins and usable width
+LEFT_MARGIN = 0.4 * inch
+RIGHT_MARGIN = 0.4 * inch
+USABLE_WIDTH = landscape(A3)[0] - LEFT_MARGIN - RIGHT_MARGIN  # Total width minus margins
+
+
+@dataclass
+class ColumnPage:
+    """Source column positions shown on one column page, with their widths."""
+    columns: list
+    widths: list
+
+
+def header_names(columns):
+    """First header row: 'Unnamed' columns repeat the name before them (so they can be
+    spanned), and any 'Others' column is shown as 'Others'."""
+    new_columns = []
+    for i, col in enumerate(columns):
+        if 'Unnamed' in str(col) and i > 0:
+            new_columns.append(new_columns[i - 1])
+        elif 'Others' in str(col):
+            new_columns.append('Others')
+        else:
+            new_columns.append(str(col))
+    return new_columns
+
+
+@dataclass
+class ColumnMeasure:
+    """Text statistics of one column at one font size (widths in points)."""
+    fit_chars: float  # length at FIT_PERCENTILE
+    max_chars: int
+    char_width: float  # widest average character width among the longest values
+    header_width: float  # longest word of the two header rows, in the header font
+
+    def text_width(self, chars):
+        """Cell width for ``chars`` characters of this column, padding included."""
+        return math.ceil(max(chars * self.char_width, self.header_width)) + CELL_PADDING
+
+    def width(self, min_size, max_size):
+        """The widest value if it fits within ``max_size``, else FIT_PERCENTILE of the values."""
+        full = self.text_width(self.max_chars)
+        if full <= max_size:
+            return max(full, min_size)
+        return min(max(self.text_width(self.fit_chars), min_size), max_size)
+
+
+def measure_column(values, fontsize, name=''):
+    """Measure ``values`` (sub-header first) with one vectorized length pass.
+
+    The lengths come from an Arrow string kernel; ``stringWidth`` is only
+    called for the ``WIDTH_SAMPLE`` longest values and the words of the
+    header rows (``name`` and the sub-header), so the cost does not depend on
+    the number of rows beyond the string conversion.
+    """
+    # Same text as the rendered cells, missing cells blank
+    text = values.astype(STRING_DTYPE).fillna('')
+    header = text.iloc[0] if len(text) else ''
+    body = text.iloc[1:]
+    lengths = body.str.len().to_numpy(dtype=float)
+
+    char_width = 0.0
+    if len(lengths):
+        longest = np.argpartition(lengths, -min(WIDTH_SAMPLE, len(lengths)))[-WIDTH_SAMPLE:]
+        char_width = max((stringWidth(text, "Helvetica", fontsize) / len(text)
+                          for text in body.iloc[longest] if text), default=0.0)
+    words = f"{name} {header}".split()
+    header_width = max((stringWidth(word, "Helvetica-Bold", fontsize + 1) for word in words), default=0.0)
+
+    return ColumnMeasure(
+        fit_chars=float(np.percentile(lengths, FIT_PERCENTILE)) if len(lengths) else 0.0,
+        max_chars=int(lengths.max()) if len(lengths) else 0,
+        char_width=char_width,
+        header_width=header_width,
+    )
+
+
+_measurements = OrderedDict()
+_measurements_lock = threading.Lock()
+
+
+def column_measurements(dataset_key, df, fontsize):
+    """``ColumnMeasure`` per column label of ``df``, cached per dataset and font size."""
+    key = (dataset_key, float(fontsize))
+    with _measurements_lock:
+        measures = _measurements.get(key)
+        if measures is not None:
+            _measurements.move_to_end(key)
+            return measures
+    # 'Unnamed' columns show the name before them, spanned over both, which is measured there
+    names = ['' if 'Unnamed' in str(column) else name for column, name in zip(df.columns, header_names(df.columns))]
+    measures = {column: measure_column(df.iloc[:, position], fontsize, names[position])
+                for position, column in enumerate(df.columns)}
+    with _measurements_lock:
+        _measurements[key] = measures
+        while len(_measurements) > MAX_MEASURED_DATASETS:
+            _measurements.popitem(last=False)
+    return measures
+
+
+def column_widths(columns, measures, min_size, max_size):
+    """Content width of every column, at least ``min_size`` and at most ``max_size`` (longer text wraps)."""
+    col_widths = []
+    for column in columns:
+        measure = measures.get(column)
+        len_num = min_size if measure is None else measure.width(min_size, max_size)
+        col_widths.append(len_num)
+    return col_widths
+
+
+def plan_column_pages(col_widths, last_col_widths=None, usable_width=USABLE_WIDTH):
+    """Split columns into pages that fit ``usable_width``, in one pass over the widths.
+
+    A column that does not fit starts a new page behind copies of the key
+    columns. Columns of the last page (after its key columns) take their
+    width from ``last_col_widths`` when given.
+    """
+    keys = list(range(min(KEY_COLUMNS, len(col_widths))))
+    key_width = sum(col_widths[:KEY_COLUMNS])
+    pages = []
+    current = []
+    total_col_width = 0
+    for idx, width in enumerate(col_widths):
+        total_col_width += width
+        if total_col_width <= usable_width:
+            current.append(idx)
+        else:
+            # Finalize the current page and repeat the key columns on the next one
+            pages.append(current)
+            current = keys + [idx]
+            total_col_width = width + key_width
+    pages.append(current)
+
+    plan = [ColumnPage(columns, [col_widths[column] for column in columns]) for columns in pages]
+    if last_col_widths is not None:
+        last = plan[-1]
+        for i, column in enumerate(last.columns):
+            if column >= KEY_COLUMNS:
+                last.widths[i] = last_col_widths[column]
+    return plan
+
+
+def plan_layout(df, measures, col_size, b_col_size, last_col_size):
+    """Column pages for ``df`` from the cached ``measures`` of its columns.
+
+    ``col_size`` is the narrowest column (``last_col_size`` on the last
+    column page) and ``b_col_size`` the widest; text beyond it wraps.
+    """
+    col_widths = column_widths(df.columns, measures, col_size, b_col_size)
+    last_col_widths = column_widths(df.columns, measures, last_col_size, max(b_col_size, last_col_size))
+    return plan_column_pages(col_widths, last_col_widths)
@@ -0,0 +1,507 @@
+"""PDF export of the filtered table.
+
+The report is a grid of row pages x column pages, each page a table with the
+two header rows repeated, followed by the signature/notes table. Pages are
+produced by a generator and fed to the document template one at a time
+(``FlowableStream``), so only the page being laid out is held in memory and
+the size of the export does not grow the story.
+
+Large exports can also be split into runs of row pages rendered in separate
+processes and stitched back together with pypdf.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A3, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch, mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from diagnostics import logger
+from normalize import text_rows
+from workers import process_pool, worker_count
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # parallel rendering needs pypdf to stitch the pieces
+    PdfReader = PdfWriter = None
+
+# Default left + right cell padding of a reportlab Table
+CELL_PADDING = 12
+# Distinct cell texts whose widths are kept while rendering (repeated values are measured once)
+WIDTH_CACHE_SIZE = 4096
+
+# Worker processes available for rendering row pages in parallel (0 = one per CPU)
+RENDER_WORKERS = worker_count("MERGE_TABLE_RENDER_WORKERS")
+
+
+@dataclass
+class ReportOptions:
+    """Everything the user can set for an export, as entered in the form."""
+    title: str = ""
+    confidential: str = "Confidential"
+    team: str = ""
+    confirm: str = ""
+    signature_data: str = ""
+    note: str = ""
+    row_page: int = 9
+    fontsize: float = 8.0
+    col_size: int = 80
+    b_col_size: int = 300
+    last_col_size: int = 80
+    logo_path: str = 'path/logo.jpg'
+    streaming: bool = True
+    workers: int = 1
+
+
+def split_into_chunks(lst, n):
+    for i in range(0, len(lst), n):
+        yield lst[i:i + n]
+
+
+def draw_page_header(canvas, team, image_path, confidential, title):
+    """The part of every page that does not change: logo, confidential note, title and team text."""
+    canvas.setFont("Helvetica", 12)
+    width, _ = A3  # A3 page size
+
+    # Header image position (top of the page)
+    image_x = 20  # 20 units from the left margin
+    image_y = 750  # 60 units from the top margin
+    image_width = 150  # Image width
+    image_height = 100  # Image height
+
+    # Draw the header image
+    canvas.drawImage(image_path, image_x, image_y, width=image_width, height=image_height)
+
+    canvas.drawString(1050, 800, confidential)
+
+    canvas.setFont("Helvetica-Bold", 16)
+    canvas.drawCentredString((width / 2)+170, 770, title)
+
+    # Team text position (on the right side)
+    team_text_width = stringWidth(team, "Helvetica", 9)
+    team_x = width + 230 - team_text_width  # Right margin padding of 10
+    team_y = 50  # Adjust y-position for team text
+
+    # Draw the team text
+    canvas.setFont("Helvetica", 12)
+    canvas.drawString(team_x, team_y, team)
+
+
+def draw_page_number(canvas, page_num):
+    """The page number below the footer."""
+    width, _ = A3
+    canvas.setFont("Helvetica", 12)
+    canvas.drawCentredString((width / 2) + 200, 20, f"Page {page_num}")
+
+
+class PageHeader:
+    """Page decoration of one document: the static header and footer, then the page number.
+
+    The header and footer are drawn once, into a form XObject, on the first
+    page; every page then only references the form and draws its number. The
+    logo is decoded and embedded once, and the text is measured once.
+    """
+
+    FORM = 'page_header'
+
+    def __init__(self, options, page_number=True):
+        self.options = options
+        self.page_number = page_number
+        self.compiled = False
+
+    def __call__(self, canvas):
+        if not self.compiled:
+            options = self.options
+            canvas.beginForm(self.FORM)
+            draw_page_header(canvas, options.team, options.logo_path, options.confidential, options.title)
+            canvas.endForm()
+            self.compiled = True
+        canvas.doForm(self.FORM)
+        # Parallel renders stamp the numbers after stitching, see stamp_page_numbers
+        if self.page_number:
+            draw_page_number(canvas, canvas.getPageNumber())
+
+
+class FlowableStream(list):
+    """A story that pulls flowables from an iterator as the document consumes them.
+
+    ``BaseDocTemplate.build`` checks ``len(flowables)`` before looking at the
+    front of the story, so refilling here keeps exactly one pending flowable
+    (plus whatever the layout splits back in) instead of the whole report.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def __len__(self):
+        if not super().__len__():
+            for flowable in self._source:
+                self.append(flowable)
+                break
+        return super().__len__()
+
+
+def page_rows(df, start, stop, columns):
+    """Cells ``start:stop`` x ``columns`` (positions) of ``df`` as lists of strings, missing cells blank.
+
+    Only the cells of the page being rendered are sliced and converted, so
+    repeating the key columns on every column page copies nothing else.
+    """
+    return text_rows(df.iloc[start:stop, columns])
+
+
+def iter_row_pages(df, row_page):
+    """The sub-header row of ``df``, then the body rows of each row page in turn, as frames.
+
+    ``df`` is a DataFrame or a ``disk_engine.DiskView``, whose rows are read
+    in chunks and regrouped into pages, so only a chunk is held at a time.
+    """
+    if not hasattr(df, 'iter_chunks'):
+        yield df.iloc[:1]
+        for start in range(1, max(len(df), 2), row_page):
+            yield df.iloc[start:start + row_page]
+        return
+    pages = 0
+    rest = None
+    for chunk in df.iter_chunks():
+        if rest is None:
+            yield chunk.iloc[:1]
+            chunk = chunk.iloc[1:]
+        elif len(rest):
+            chunk = pd.concat([rest, chunk], ignore_index=True)
+        full = len(chunk) - len(chunk) % row_page
+        for start in range(0, full, row_page):
+            yield chunk.iloc[start:start + row_page]
+            pages += 1
+        rest = chunk.iloc[full:]
+    if rest is not None and (len(rest) or not pages):
+        yield rest
+
+
+def count_row_pages(n_rows, row_page):
+    """Number of row pages for a frame of ``n_rows`` rows (sub-header row included)."""
+    return max(1, -(-(n_rows - 1) // row_page))
+
+
+class CellRenderer:
+    """Turns cell text into table content, with styles computed once per export and text widths cached.
+
+    Building and wrapping a Paragraph is the most expensive part of laying
+    out a page, so body cells whose text fits on one line of their column are
+    passed to the table as plain strings, styled through TableStyle commands
+    to match the Paragraph style. Only overflowing cells become Paragraphs.
+    """
+
+    def __init__(self, fontsize):
+        self.fontsize = fontsize
+        self.style_header = ParagraphStyle(name="HeaderStyle", fontSize=fontsize + 1, leading=fontsize + 4,
+                                           textColor="white", fontName="Helvetica-Bold",alignment=TA_CENTER)
+        self.style_body = ParagraphStyle(name="BodyStyle", fontSize=fontsize, leading=fontsize + 3,
+                                         textColor="black")
+        # Plain-string body cells (row 2 onwards) rendered like style_body
+        self.body_style_commands = [
+            ('FONTSIZE', (0, 2), (-1, -1), fontsize),
+            ('LEADING', (0, 2), (-1, -1), fontsize + 3),
+            ('TEXTCOLOR', (0, 2), (-1, -1), colors.black),
+        ]
+        # Bounded, so the export's memory does not grow with its number of distinct texts
+        self.text_width = lru_cache(maxsize=WIDTH_CACHE_SIZE)(self._text_width)
+
+    def _text_width(self, text):
+        return stringWidth(text, self.style_body.fontName, self.fontsize)
+
+    def header_cell(self, text):
+        return Paragraph(text, self.style_header)
+
+    def body_cell(self, text, col_width):
+        if '\n' not in text and self.text_width(text) <= col_width - CELL_PADDING:
+            return text
+        return Paragraph(text, self.style_body)
+
+
+class HeaderPlan:
+    """The two header rows of one column page and the table style that goes with them.
+
+    Spans and backgrounds depend only on the header text of the column page,
+    so they are worked out once per column page and shared by the tables of
+    every row page.
+    """
+
+    def __init__(self, header_row, sub_header_row, renderer):
+        self.cells = [[renderer.header_cell(item) for item in header_row],
+                      [renderer.header_cell(item) for item in sub_header_row]]
+        self.style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 1), colors.red),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 1 * mm),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0 * mm),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ] + renderer.body_style_commands)
+
+        col_idx = 0
+        while col_idx < len(header_row):
+            start_idx = col_idx
+            # Find the continuous range of identical column headers in row 0.
+            while (col_idx + 1 < len(header_row) and header_row[col_idx] == header_row[col_idx + 1]):
+                col_idx += 1
+
+            # If there are identical consecutive column headers, apply merging.
+            # (The SPAN hides the repeated headers; Table copies its data on
+            # construction, so they were never cleared from the cells.)
+            if start_idx != col_idx:
+                # use SPAN
+                self.style.add('SPAN', (start_idx, 0), (col_idx, 0))
+
+            col_idx += 1
+
+        for col_idx in range(len(sub_header_row)):
+            if header_row[col_idx] in ("Other", "Others"):
+                self.style.add('SPAN', (col_idx, 0), (col_idx, 1))
+                self.style.add('BACKGROUND', (col_idx, 0), (col_idx, 1), colors.black)
+            else:
+                if sub_header_row[col_idx] == "":
+                    # If the value in row 1 is empty, merge row 0 and row 1.
+                    self.style.add('SPAN', (col_idx, 0), (col_idx, 1))
+                elif sub_header_row[col_idx] in ("Other", "Others"):
+                    self.style.add('BACKGROUND', (col_idx, 1), (col_idx, 1), colors.black)
+
+
+def iter_page_tables(df, header, column_pages, row_page, fontsize, num_row_pages=None):
+    """Yield the table flowables (and page breaks) for every row page x column page block.
+
+    ``df`` (a DataFrame or ``DiskView``) starts with the sub-header row, ``header`` holds the first header
+    row (see ``pdf_layout.header_names``) and ``column_pages`` the column
+    plan from ``pdf_layout.plan_layout``. ``num_row_pages`` overrides the page
+    count when ``df`` holds only a slice of the rows (see ``render_row_pages``).
+    """
+    renderer = CellRenderer(fontsize)
+
+    if num_row_pages is None:
+        num_row_pages = count_row_pages(len(df), row_page)
+    num_col_pages = len(column_pages)
+    row_pages = iter_row_pages(df, row_page)
+    sub_header = next(row_pages)
+
+    # Header rows, spans and styles of each column page, shared by all row pages
+    header_plans = [HeaderPlan([header[column] for column in column_page.columns],
+                               page_rows(sub_header, 0, 1, column_page.columns)[0], renderer)
+                    if column_page.columns else None
+                    for column_page in column_pages]
+    empty_pages = sum(header_plan is None for header_plan in header_plans)
+    if empty_pages:
+        logger.warning("%d of %d column page(s) have no columns and are left out of the PDF.",
+                       empty_pages, num_col_pages)
+
+    # Iterate over row pages
+    for row_page_no, rows in zip(range(num_row_pages), row_pages):
+        # Iterate over column pages
+        for col_page, (column_page, header_plan) in enumerate(zip(column_pages, header_plans)):
+            # Skip if the column page is empty
+            if header_plan is None:
+                continue
+
+            # Header rows are Paragraphs; body cells stay plain strings unless they need wrapping
+            page_widths = column_page.widths
+            wrapped_data = [list(row) for row in header_plan.cells]
+            wrapped_data.extend([renderer.body_cell(item, width) for item, width in zip(row, page_widths)]
+                                for row in page_rows(rows, 0, row_page, column_page.columns))
+
+            # Create table and apply the column page's style
+            table = Table(wrapped_data, repeatRows=2 ,colWidths=page_widths)
+            table.setStyle(header_plan.style)
+
+            yield KeepTogether([table])
+
+            # Add page break if not the last row or column page
+            if row_page_no < num_row_pages - 1 or col_page < num_col_pages - 1:
+                yield PageBreak()
+
+
+def closing_flowables(confirm, signature_data, note1):
+    """The signature block and the notes, laid out side by side after the last table."""
+    styles = getSampleStyleSheet()
+    no_gap_style = ParagraphStyle(
+        'NoGapStyle',
+        parent=styles['Normal'],
+        fontSize=12,
+        leading=14,
+        spaceBefore=0,
+        spaceAfter=0,
+    )
+
+    # Left and right content
+
+    left_content = [
+        Paragraph(f"Confirmed by ({confirm}):", no_gap_style),
+        Spacer(1, 20),
+        Paragraph("Signature: ______________________________", no_gap_style),
+        Spacer(1, 5),
+        Paragraph(f"Date: {signature_data}", no_gap_style),
+        Paragraph("Name:", no_gap_style),
+        Paragraph("Designation:", no_gap_style),
+    ]
+
+
+    note_lines = [line.strip() for line in note1.split('-') if line.strip()]
+    grouped_note_lines = list(split_into_chunks(note_lines, 6))
+
+
+    combined_data = []
+
+    for i, group in enumerate(grouped_note_lines):
+
+        note_paragraphs = [
+            Paragraph(f"- {line}" if not (i == 0 and j == 0) else line, no_gap_style)
+            for j, line in enumerate(group)
+        ]
+
+
+        left_column = Table([[line] for line in left_content],
+                            colWidths=[5 * inch]) if i == 0 else Paragraph("", no_gap_style)
+
+        row = [
+            left_column, "",
+            Table([[line] for line in note_paragraphs], colWidths=[5.5 * inch]),
+        ]
+        combined_data.append(row)
+
+    combined_table = Table(combined_data, colWidths=[5 * inch, 5.5 * inch])
+    combined_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ('TOPPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    ]))
+
+    return [Spacer(1, 20), combined_table]
+
+
+def report_flowables(df, header, column_pages, options, num_row_pages=None, closing=True):
+    yield from iter_page_tables(df, header, column_pages, options.row_page, options.fontsize, num_row_pages)
+    if closing:
+        yield from closing_flowables(options.confirm, options.signature_data, options.note)
+
+
+def count_pages(n_rows, column_pages, row_page):
+    """Number of table pages (row pages x non-empty column pages) of a report, for progress display."""
+    return count_row_pages(n_rows, row_page) * sum(1 for page in column_pages if page.columns)
+
+
+def render_document(buffer, flowables, options, page_number=True, progress=None):
+    """Build the document into ``buffer``.
+
+    ``progress(pages)`` is called with the number of finished pages as each
+    page starts and once more at the end; it may raise to abort the build.
+    """
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A3), leftMargin=0 * inch,
+                            rightMargin=0 * inch, topMargin=1.2 * inch, bottomMargin= 0.8* inch)
+
+    story = FlowableStream(flowables) if options.streaming else list(flowables)
+    page_header = PageHeader(options, page_number)
+
+    def on_page(canvas, _):
+        if progress is not None:
+            progress(canvas.getPageNumber() - 1)
+        page_header(canvas)
+
+    # Build the PDF and save to buffer
+    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    if progress is not None:
+        progress(doc.page)
+
+
+def render_row_pages(df, header, column_pages, options, num_row_pages, closing):
+    """Worker entry point: render a run of row pages without page numbers and return the PDF bytes.
+
+    ``df`` holds the sub-header row followed by the body rows of those pages.
+    """
+    buffer = BytesIO()
+    flowables = report_flowables(df, header, column_pages, options, num_row_pages, closing)
+    render_document(buffer, flowables, options, page_number=False)
+    return buffer.getvalue()
+
+
+def stamp_page_numbers(writer):
+    """Draw ``Page n`` on every page of the stitched document."""
+    overlay = BytesIO()
+    canvas = Canvas(overlay, pagesize=landscape(A3))
+    for page_num in range(1, len(writer.pages) + 1):
+        draw_page_number(canvas, page_num)
+        canvas.showPage()
+    canvas.save()
+    overlay.seek(0)
+    for page, number_page in zip(writer.pages, PdfReader(overlay).pages):
+        page.merge_page(number_page)
+        # Merging leaves the page's content uncompressed
+        page.compress_content_streams()
+
+
+def build_report_parallel(buffer, df, header, column_pages, options, progress=None):
+    """Render runs of row pages in the render pool and stitch them into one PDF.
+
+    Each run is laid out on its own, so a block that overflows onto extra
+    pages only shifts the numbering of later runs; numbers are therefore
+    stamped after stitching. The signature/notes table flows after the last
+    run's final table exactly as in a single build.
+    """
+    row_page = options.row_page
+    num_row_pages = count_row_pages(len(df), row_page)
+    n_runs = min(options.workers, num_row_pages)
+    bounds = [num_row_pages * i // n_runs for i in range(n_runs + 1)]
+
+    pool = process_pool('render', RENDER_WORKERS)
+    futures = []
+    for i in range(n_runs):
+        first, last = bounds[i], bounds[i + 1]
+        # Body rows of row page p are 1 + p * row_page up to 1 + (p + 1) * row_page
+        rows = df.iloc[np.r_[0:1, 1 + first * row_page:min(1 + last * row_page, len(df))]]
+        futures.append(pool.submit(render_row_pages, rows, header, column_pages, options,
+                                   last - first, i == n_runs - 1))
+
+    writer = PdfWriter()
+    try:
+        for future in futures:
+            writer.append(PdfReader(BytesIO(future.result())))
+            if progress is not None:
+                progress(len(writer.pages))
+    except BaseException:
+        # Aborted (e.g. cancelled through progress): drop the runs that have not started
+        for future in futures:
+            future.cancel()
+        raise
+    stamp_page_numbers(writer)
+    if hasattr(writer, 'compress_identical_objects'):
+        # Every run embeds its own copy of the page header form and the logo; keep one
+        writer.compress_identical_objects()
+    writer.write(buffer)
+
+
+def build_report(buffer, df, header, column_pages, options, progress=None):
+    """Render the report for ``df`` (sub-header row first) into ``buffer``, laid out by ``column_pages``.
+
+    With ``options.streaming`` the pages are generated while the document is
+    built; otherwise the whole story is materialized first, as before. Both
+    produce the same PDF. With ``options.workers > 1`` (and pypdf installed)
+    runs of row pages of a DataFrame are rendered in parallel and stitched
+    together; a ``DiskView`` is rendered in one pass over its chunks.
+    ``progress`` is passed on to ``render_document`` (parallel builds report
+    once per finished run).
+    """
+    if (options.workers > 1 and PdfWriter is not None and not hasattr(df, 'iter_chunks')
+            and count_row_pages(len(df), options.row_page) > 1):
+        build_report_parallel(buffer, df, header, column_pages, options, progress)
+    else:
+        render_document(buffer, report_flowables(df, header, column_pages, options), options, progress=progress)
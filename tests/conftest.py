@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The app's modules sit at the repository root; their caches go to a scratch directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MERGE_TABLE_CACHE_DIR", tempfile.mkdtemp(prefix="merge_table_tests_"))
+
+
+def upload(file_no, keys, columns, seed):
+    """An upload with a sub-header row: the 'ID' key column, then ``columns`` of text ('t...') or numbers."""
+    rng = np.random.default_rng(seed)
+    data = {'ID': [f"k{key}" for key in keys]}
+    for column in columns:
+        if column.startswith('t'):
+            data[column] = rng.choice(['red', 'green', 'blue', None], len(keys))
+        else:
+            data[column] = rng.integers(0, 1000, len(keys))
+    df = pd.DataFrame(data)
+    sub_header = pd.DataFrame([[f"sub{file_no}_{c}" for c in range(df.shape[1])]], columns=df.columns)
+    sub_header['ID'] = 'id'
+    return pd.concat([sub_header, df], ignore_index=True)
+
+
+@pytest.fixture
+def make_upload():
+    return upload
@@ -0,0 +1,80 @@
+"""Budget, sharing and spilling of the data manager."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_manager import DataManager, frame_nbytes
+from disk_cache import DiskFrameStore
+
+
+def frame(rows, seed=0):
+    return pd.DataFrame({'n': np.random.default_rng(seed).integers(0, 100, rows), 't': [f"v{i}" for i in range(rows)]})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskFrameStore(str(tmp_path), 100 * 1024 * 1024)
+
+
+def test_least_recently_used_entries_are_evicted(store):
+    frames = [frame(100, seed) for seed in range(3)]
+    manager = DataManager(2 * frame_nbytes(frames[0]) + 100, store)
+
+    manager.put('a', frames[0])
+    manager.put('b', frames[1])
+    assert manager.get('a') is frames[0]
+    manager.put('c', frames[2])
+
+    assert manager.get('b') is None
+    assert manager.get('a') is frames[0] and manager.get('c') is frames[2]
+    assert manager.current_bytes <= manager.max_bytes and manager.evictions == 1
+
+
+def test_idle_sessions_are_evicted_first(store):
+    frames = [frame(100, seed) for seed in range(3)]
+    manager = DataManager(2 * frame_nbytes(frames[0]) + 100, store, idle_seconds=60)
+
+    manager.enter_session('active')
+    manager.put('active', frames[0])
+    manager.enter_session('idle')
+    manager.put('idle', frames[1])
+    manager._last_seen['idle'] -= 120
+    manager.enter_session('active')
+    manager.put('new', frames[2])
+
+    assert manager.get('idle') is None and manager.get('active') is frames[0]
+
+
+def test_spilled_frames_are_reloaded(store):
+    first, second = frame(200, 1), frame(200, 2)
+    manager = DataManager(frame_nbytes(first) + 100, store)
+
+    manager.put('first', first, spill=True)
+    manager.put('second', second)
+    assert manager.usage().spilled_entries == 1 and len(manager) == 1
+
+    reloaded = manager.get('first')
+    pd.testing.assert_frame_equal(reloaded, first, check_dtype=False)
+    assert manager.get('second') is None  # evicted, without spilling, to make room
+
+
+def test_release_keeps_entries_other_sessions_use(store):
+    manager = DataManager(10 * 1024 * 1024, store)
+    shared, own = frame(10), frame(10, 1)
+
+    manager.enter_session('one')
+    manager.put('shared', shared)
+    manager.put('own', own)
+    manager.enter_session('two')
+    assert manager.get('shared') is shared
+
+    manager.enter_session('one')
+    manager.release('shared')
+    manager.release('own')
+
+    assert manager.get('own') is None
+    assert manager.current_bytes == frame_nbytes(shared)
+    manager.enter_session('two')
+    assert manager.get('shared') is shared
+    manager.release('shared')
+    assert len(manager) == 0 and manager.current_bytes == 0
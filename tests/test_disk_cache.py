@@ -0,0 +1,39 @@
+"""Round trips through the Arrow frame store."""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from disk_cache import DiskFrameStore, decode_mixed, encode_mixed
+
+MIXED = pd.Series(['text', 7, 2.5, True, None, pd.Timestamp('2024-01-02 03:04'), datetime.date(2024, 5, 6),
+                   datetime.datetime(2024, 5, 6, 7, 8), datetime.time(9, 10), np.nan, np.int64(3)], dtype=object)
+
+
+def test_mixed_cells_round_trip():
+    text, codes = encode_mixed(MIXED)
+    cells = decode_mixed(text, codes)
+
+    assert [type(cell) for cell in cells] == [str, int, float, bool, float, pd.Timestamp, datetime.date,
+                                              datetime.datetime, datetime.time, float, int]
+    assert cells[4] != cells[4] and cells[9] != cells[9]  # missing cells come back as NaN
+    present = [i for i in range(len(MIXED)) if i not in (4, 9)]
+    assert [cells[i] for i in present] == [MIXED[i] for i in present]
+
+
+def test_single_type_columns_are_left_to_arrow():
+    assert encode_mixed(pd.Series(['a', None, 'b'], dtype=object)) is None
+    assert encode_mixed(pd.Series([1, 2.5, 'x', object()], dtype=object)) is None
+
+
+def test_store_keeps_mixed_columns(tmp_path):
+    store = DiskFrameStore(str(tmp_path), 10 * 1024 * 1024)
+    df = pd.DataFrame({'mixed': MIXED, 'text': ['sub'] + [f"v{i}" for i in range(len(MIXED) - 1)]})
+
+    assert store.put('mixed', df, rows=len(df))
+    stored, metadata = store.get('mixed')
+
+    assert metadata == {'rows': len(df)}
+    assert stored.columns.tolist() == ['mixed', 'text']
+    # Missing cells come back as NaN, as pandas readers give them
+    pd.testing.assert_frame_equal(stored, df.assign(mixed=MIXED.where(MIXED.notna(), np.nan)))
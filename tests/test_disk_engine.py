@@ -0,0 +1,83 @@
+"""The disk engine against the pandas path on the same uploads."""
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+import disk_engine
+from disk_engine import DiskFeed, open_dataset
+from exports import write_csv
+from filter_engine import FilterIndex, filter_positions
+from merge_engine import merge_uploads, prepare_uploads
+
+
+def csv_bytes(df):
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_disk_engine_csv_matches_pandas_engine(make_upload):
+    frames = [make_upload(0, np.random.default_rng(3).permutation(60), ['filter', 'n1', 't1'], 3),
+              make_upload(1, np.random.default_rng(4).permutation(50), ['n2', 't2', 'Unnamed: 3'], 4)]
+    frames[0]['filter'] = ['flt'] + list(np.random.default_rng(5).choice(['a', 'b', 'c'], 60))
+    files = [(f"file{i}.csv", csv_bytes(df)) for i, df in enumerate(frames)]
+    names = [name for name, _ in files]
+    predicates = {'filter': ['a', 'c']}
+
+    uploads, keys = prepare_uploads(files)
+    merged, dataset_key, _, _ = merge_uploads(uploads, names, keys, files)
+    filtered = merged.take(filter_positions(FilterIndex(merged), predicates)).reset_index(drop=True)
+    dataset, _ = open_dataset([data for _, data in files], names)
+    view = dataset.select(predicates)
+
+    assert dataset.columns == merged.columns.tolist()
+    assert dataset.n_rows == len(merged) and len(view) == len(filtered)
+    assert dataset.column('filter').categories == FilterIndex(merged).column('filter').categories
+    pandas_csv, disk_csv = BytesIO(), BytesIO()
+    write_csv(filtered, pandas_csv, chunk_rows=7)
+    write_csv(view, disk_csv, chunk_rows=7)
+    assert disk_csv.getvalue() == pandas_csv.getvalue()
+
+
+def numbers_dataset():
+    data = b"ID,n,t\nid,count,label\nk1,10,b10\nk2,9,a\nk3,,b9\nk4,100,c\nk5,2,a\n"
+    return open_dataset([data], ["numbers.csv"])[0]
+
+
+def test_numeric_columns_sort_by_value():
+    dataset = numbers_dataset()
+    feed = DiskFeed(dataset.select({}))
+
+    assert feed.window(['n'], 0, 'n')['n'].tolist() == ['count', '2', '9', '10', '100', None]
+    assert feed.window(['n'], 0, 'n', ascending=False)['n'].tolist() == ['count', '100', '10', '9', '2', None]
+    assert feed.window(['t'], 0, 't')['t'].tolist() == ['label', 'a', 'a', 'b10', 'b9', 'c']
+
+
+def test_replaced_selection_is_dropped_unless_in_use():
+    dataset = numbers_dataset()
+
+    def stored():
+        with dataset.connect() as connection:
+            return {name for name, in connection.execute("SELECT name FROM selections")}
+
+    first = dataset.select({'t': ['a']})
+    table = first.table
+    dataset.drop_selection(table)
+    assert table in stored()  # still read by ``first``
+
+    del first
+    dataset.drop_selection(table)
+    assert table not in stored()
+    assert len(dataset.select({'t': ['a']})) == 3  # selected again on demand
+
+
+def test_open_databases_are_not_evicted(monkeypatch):
+    dataset = numbers_dataset()
+    monkeypatch.setattr(disk_engine.databases, 'max_bytes', 0)
+
+    disk_engine.databases.evict()
+
+    assert os.path.exists(dataset.path)
+    assert len(dataset.select({'t': ['c']})) == 2
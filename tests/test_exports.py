@@ -0,0 +1,54 @@
+"""Chunked exports against the files built from the whole frame at once."""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exports import csv_frame, write_csv, write_parquet, write_xlsx
+from normalize import normalize_frame
+
+
+@pytest.fixture
+def table(make_upload):
+    df = make_upload(0, range(45), ['n1', 't1', 'Unnamed: 3', 't2'], 0)
+    df.loc[5:9, 'n1'] = np.nan
+    return normalize_frame(df)[0]
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 45, 1000])
+def test_csv_matches_a_single_to_csv(table, chunk_rows):
+    f = BytesIO()
+    write_csv(table, f, chunk_rows=chunk_rows)
+
+    assert f.getvalue() == csv_frame(table).to_csv(index=False).encode()
+
+
+def sheet_rows(data):
+    from openpyxl import load_workbook
+
+    return [list(row) for row in load_workbook(BytesIO(data), read_only=True).active.iter_rows(values_only=True)]
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 1000])
+def test_xlsx_matches_a_single_chunk(table, chunk_rows):
+    whole, chunked = BytesIO(), BytesIO()
+    write_xlsx(table, whole, chunk_rows=len(table))
+    write_xlsx(table, chunked, chunk_rows=chunk_rows)
+
+    rows = sheet_rows(chunked.getvalue())
+    assert rows == sheet_rows(whole.getvalue())
+    assert rows[0] == ['ID', 'n1', 't1', None, 't2']
+    assert len(rows) == len(table) + 1
+    assert rows[6][1] is None  # missing cells are left empty
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 1000])
+def test_parquet_round_trip(table, chunk_rows):
+    pytest.importorskip('pyarrow')
+    f = BytesIO()
+    write_parquet(table, f, chunk_rows=chunk_rows)
+
+    stored = pd.read_parquet(BytesIO(f.getvalue()))
+    assert stored.astype(object).where(stored.notna(), None).values.tolist() == \
+        table.astype(object).where(table.notna(), None).values.tolist()
@@ -0,0 +1,43 @@
+"""Indexed filtering against boolean masks over the same frame."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_engine import FilterIndex, filter_positions
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        'filter': ['flt'] + list(rng.choice(['a', 'b', 'c'], 200)),
+        'value': np.concatenate([[-1.0], rng.integers(0, 100, 200).astype(float)]),
+    })
+
+
+@pytest.mark.parametrize('predicates', [
+    {},
+    {'filter': []},
+    {'filter': ['a']},
+    {'filter': ['a', 'c']},
+    {'value': (20, 60)},
+    {'filter': ['b'], 'value': (0, 50)},
+    {'filter': ['nowhere']},
+])
+def test_filter_positions_keep_the_pinned_row(table, predicates):
+    mask = pd.Series(True, index=table.index)
+    for column, condition in predicates.items():
+        if isinstance(condition, tuple):
+            mask &= table[column].between(*condition)
+        elif condition:
+            mask &= table[column].isin(condition)
+    expected = np.union1d([0], np.flatnonzero(mask.to_numpy()))
+
+    positions = filter_positions(FilterIndex(table), predicates)
+
+    np.testing.assert_array_equal(positions, expected)
+
+
+def test_unknown_column_raises(table):
+    with pytest.raises(KeyError, match='missing'):
+        FilterIndex(table).column('missing')
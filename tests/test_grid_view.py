@@ -0,0 +1,61 @@
+"""Grid feed ordering and the edit log."""
+import numpy as np
+import pandas as pd
+
+from filter_engine import FilterIndex, filter_positions
+from grid_view import ROW_ID, EditLog, GridFeed, set_cells
+
+
+def test_numeric_text_sorts_by_value():
+    df = pd.DataFrame({'n': pd.Series(['sub', '10', '100', None, '2', '9'], dtype='string[pyarrow]'),
+                       't': ['sub', 'b10', 'a', 'b9', None, 'c']})
+    feed = GridFeed('numeric-sort', df)
+
+    assert df['n'].take(feed.order('n')).tolist()[:4] == ['2', '9', '10', '100']
+    assert df['n'].take(feed.order('n', ascending=False)).tolist()[:4] == ['100', '10', '9', '2']
+    assert df['t'].take(feed.order('t')).tolist()[:4] == ['a', 'b10', 'b9', 'c']
+    assert feed.positions(0, 'n')[0] == 0  # the sub-header row stays on top
+
+
+def test_edits_are_replayed_across_filter_changes():
+    rng = np.random.default_rng(7)
+    merged = pd.DataFrame({
+        'filter': ['flt'] + list(rng.choice(['a', 'b', 'c'], 200)),
+        'value': np.concatenate([[-1.0], rng.integers(0, 100, 200).astype(float)]),
+    })
+    index = FilterIndex(merged)
+    log = EditLog('dataset')
+
+    # Edit the first body row shown under one filter
+    positions = filter_positions(index, {'filter': ['a']})
+    filtered = merged.take(positions).reset_index(drop=True)
+    returned = filtered.iloc[:3].assign(**{ROW_ID: range(3)})
+    returned.loc[1, 'filter'] = 'edited'
+    edits = log.record(filtered, positions, returned)
+    edited_row = positions[1]
+
+    assert [(edit.row, edit.column, edit.new) for edit in edits] == [(edited_row, 'filter', 'edited')]
+    assert filtered.loc[1, 'filter'] == 'edited'
+    assert merged.loc[edited_row, 'filter'] == 'a'  # the shared frame is not written to
+
+    # A filter that still shows the row gets the edit back; one that hides it skips it
+    for predicates, shown in (({}, True), ({'value': (0, 1000)}, True), ({'filter': ['b']}, False)):
+        positions = filter_positions(index, predicates)
+        refiltered = merged.take(positions).reset_index(drop=True)
+        log.apply(refiltered, positions)
+        rows = np.flatnonzero(positions == edited_row)
+        assert bool(len(rows)) == shown
+        if shown:
+            assert refiltered.loc[rows[0], 'filter'] == 'edited'
+        assert (refiltered['filter'] == 'edited').sum() == int(shown)
+
+
+def test_categorical_edit_keeps_the_column_categorical():
+    shared = pd.Series(['a', 'b', 'a', None], dtype='category')
+    df = pd.DataFrame({'c': shared})
+
+    set_cells(df, 'c', [0, 3], ['new', 'b'])
+
+    assert isinstance(df['c'].dtype, pd.CategoricalDtype)
+    assert df['c'].tolist() == ['new', 'b', 'a', 'b']
+    assert shared.tolist()[0] == 'a' and 'new' not in shared.cat.categories
@@ -0,0 +1,43 @@
+"""multi_way_join against the chained pd.merge it replaced."""
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from merge_engine import multi_way_join
+
+
+def chained_merge(frames, key_column='ID'):
+    """The join the app did before: chained inner ``pd.merge`` calls on the key as text."""
+    frames = [df.astype({key_column: str}) for df in frames]
+    return reduce(lambda left, right: pd.merge(left, right, on=key_column, how='inner', validate='1:1'), frames)
+
+
+def test_join_matches_chained_merge(make_upload):
+    # Shuffled keys, rows missing from some files, and a column name shared by two files
+    frames = [make_upload(0, np.random.default_rng(0).permutation(40), ['n1', 't1', 'shared'], 0),
+              make_upload(1, np.random.default_rng(1).permutation(35), ['n2', 'shared'], 1),
+              make_upload(2, np.random.default_rng(2).permutation(38)[:30], ['t3'], 2)]
+    merged, reports = multi_way_join(frames, ['a', 'b', 'c'])
+    expected = chained_merge(frames)
+
+    assert merged.columns.tolist() == expected.columns.tolist()
+    assert 'shared_x' in merged.columns and 'shared_y' in merged.columns
+    pd.testing.assert_frame_equal(merged, expected, check_dtype=False)
+    assert [report.unmatched_rows for report in reports] == [len(df) - len(merged) for df in frames]
+    assert not any(report.skipped for report in reports)
+
+
+def test_join_reports_and_skips_bad_files(make_upload):
+    good = make_upload(0, range(20), ['n1'], 0)
+    other = make_upload(1, range(5, 25), ['n2'], 1)
+    duplicated = make_upload(2, list(range(10)) + [3, 4], ['n3'], 2)
+    missing = make_upload(3, range(20), ['n4'], 3).rename(columns={'ID': 'Key'})
+
+    merged, reports = multi_way_join([good, duplicated, other, missing], ['good', 'dup', 'other', 'missing'])
+
+    pd.testing.assert_frame_equal(merged, chained_merge([good, other]), check_dtype=False)
+    assert sorted(reports[1].duplicate_keys) == ['k3', 'k4']
+    assert reports[1].skipped and not reports[1].missing_key_column
+    assert reports[3].missing_key_column and reports[3].skipped
+    assert reports[0].unmatched_rows == 5 and reports[2].unmatched_rows == 5
@@ -0,0 +1,36 @@
+"""Compact column types keep the text of every cell."""
+import numpy as np
+import pandas as pd
+
+from normalize import compact_column, normalize_frame, text_rows
+
+
+def test_compact_column_types():
+    repeated = pd.Series(['sub'] + ['red', 'green', None] * 10, dtype=object)
+    distinct = pd.Series(['sub'] + [f"v{i}" for i in range(30)], dtype=object)
+    numbers = pd.Series([1.5, 2.0, np.nan])
+
+    assert isinstance(compact_column(repeated).dtype, pd.CategoricalDtype)
+    assert isinstance(compact_column(distinct).dtype, pd.StringDtype)
+    assert compact_column(numbers) is numbers
+    assert compact_column(repeated).isna().sum() == 10  # missing cells stay missing
+
+
+def test_keys_become_text_without_excel_floats():
+    keys = pd.Series([101.0, 102.0, 103.5])
+
+    assert compact_column(keys, key=True).tolist() == ['101', '102', '103.5']
+
+
+def test_normalize_frame_keeps_the_cell_text(make_upload):
+    df = make_upload(0, range(50), ['n1', 't1', 't2'], 0).astype(object)
+    df['t2'] = ['sub'] + [f"text {i}" for i in range(50)]
+    df['f'] = np.arange(51.0)
+
+    compact, usage = normalize_frame(df)
+
+    assert text_rows(compact) == text_rows(df)
+    assert compact.columns.tolist() == df.columns.tolist()
+    assert (usage.categorical, usage.strings, usage.typed) == (1, 3, 1)  # t1; ID, n1, t2; f
+    assert usage.after_bytes == sum(compact.memory_usage(deep=True)) and usage.saved_bytes > 0
+    assert df.dtypes.tolist() == [object] * 4 + [np.float64]  # the input frame is left as it was
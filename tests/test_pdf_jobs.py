@@ -0,0 +1,64 @@
+"""Cancelling background PDF exports."""
+import os
+import time
+
+import pytest
+
+from pdf_jobs import CANCELLED, DONE, ExportJob, submit_export
+from pdf_layout import column_measurements, header_names, plan_layout
+from pdf_report import ReportOptions, count_pages
+
+LOGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'path', 'logo.jpg')
+
+
+@pytest.fixture
+def report(make_upload):
+    df = make_upload(0, range(200), ['n1', 't1', 'n2'], 0)
+    options = ReportOptions(title="Report", note="first - second", row_page=5, logo_path=LOGO)
+    measures = column_measurements('pdf-jobs-test', df, options.fontsize)
+    column_pages = plan_layout(df, measures, options.col_size, options.b_col_size, options.last_col_size)
+    return df, header_names(df.columns), column_pages, options
+
+
+class CancelledAfterFirstPage(ExportJob):
+    def progress(self, pages):
+        if pages >= 1:
+            self.cancel()
+        super().progress(pages)
+
+
+def test_cancel_stops_between_pages(report):
+    df, header, column_pages, options = report
+    job = CancelledAfterFirstPage("output.pdf", count_pages(len(df), column_pages, options.row_page))
+
+    job.run(df, header, column_pages, options)
+
+    assert job.status == CANCELLED and not job.active
+    assert job.pages_done <= 1 < job.pages_total
+    assert job.pdf() is None
+
+
+def test_cancelled_job_does_not_start(report):
+    df, header, column_pages, options = report
+    job = ExportJob("output.pdf", count_pages(len(df), column_pages, options.row_page))
+
+    job.cancel()
+    job.run(df, header, column_pages, options)
+
+    assert job.status == CANCELLED and job.pages_done == 0
+
+
+def test_submitted_jobs_can_be_cancelled(report):
+    running = [submit_export(*report, "output.pdf") for _ in range(3)]
+    for job in running:
+        job.cancel()
+    deadline = time.time() + 60
+    while any(job.active for job in running) and time.time() < deadline:
+        time.sleep(0.05)
+
+    assert [job.status for job in running] == [CANCELLED] * 3
+    assert all(job.pdf() is None for job in running)
+
+    finished = submit_export(*report, "output.pdf")
+    finished.future.result()
+    assert finished.status == DONE and finished.pdf().startswith(b"%PDF")
@@ -0,0 +1,41 @@
+"""Column-page planning on widths alone."""
+import numpy as np
+import pytest
+
+from pdf_layout import KEY_COLUMNS, plan_column_pages
+
+
+def test_pages_repeat_the_key_columns():
+    widths = [70, 70, 70, 100, 200, 150, 100, 300]
+    plan = plan_column_pages(widths, usable_width=500)
+
+    assert [page.columns for page in plan] == [[0, 1, 2, 3], [0, 1, 2, 4], [0, 1, 2, 5, 6], [0, 1, 2, 7]]
+    assert [page.widths for page in plan][1] == [70, 70, 70, 200]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_every_column_is_placed_once_in_order(seed):
+    rng = np.random.default_rng(seed)
+    widths = list(rng.integers(40, 300, 60))
+    last_widths = [width + 5 for width in widths]
+    usable_width = 1100
+
+    plan = plan_column_pages(widths, last_widths, usable_width=usable_width)
+
+    body = [column for page in plan for column in page.columns if column >= KEY_COLUMNS]
+    assert body == list(range(KEY_COLUMNS, len(widths)))
+    assert plan[0].columns[:KEY_COLUMNS] == list(range(KEY_COLUMNS))
+    for page in plan[1:]:
+        assert page.columns[:KEY_COLUMNS] == list(range(KEY_COLUMNS))
+    for page in plan[:-1]:
+        assert page.widths == [widths[column] for column in page.columns]
+        assert sum(page.widths) <= usable_width
+    # The last page's own columns take the last-page widths, its key columns keep theirs
+    assert plan[-1].widths == [(last_widths if column >= KEY_COLUMNS else widths)[column]
+                               for column in plan[-1].columns]
+
+
+def test_few_columns_fit_one_page():
+    plan = plan_column_pages([100, 120])
+
+    assert len(plan) == 1 and plan[0].columns == [0, 1] and plan[0].widths == [100, 120]
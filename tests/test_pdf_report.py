@@ -0,0 +1,43 @@
+"""Parallel PDF rendering against a single build of the same report."""
+import os
+import re
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdf_layout import column_measurements, header_names, plan_layout
+from pdf_report import ReportOptions, build_report
+
+pypdf = pytest.importorskip('pypdf')
+
+LOGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'path', 'logo.jpg')
+
+
+def report_pages(df, options):
+    measures = column_measurements('pdf-report-test', df, options.fontsize)
+    column_pages = plan_layout(df, measures, options.col_size, options.b_col_size, options.last_col_size)
+    buffer = BytesIO()
+    build_report(buffer, df, header_names(df.columns), column_pages, options)
+    return [page.extract_text() for page in pypdf.PdfReader(BytesIO(buffer.getvalue())).pages]
+
+
+def test_parallel_build_matches_single_build(make_upload):
+    df = make_upload(0, range(60), ['n1', 't1', 'n2', 't2'], 0)
+    df['t1'] = [f"long text {i} " * (i % 4) for i in range(len(df))]
+    options = ReportOptions(title="Report", team="Team", note="first - second", row_page=7, logo_path=LOGO)
+
+    single = report_pages(df, options)
+    options.workers = 3
+    stitched = report_pages(df, options)
+
+    def without_number(text):
+        return re.sub(r"Page \d+\n", "", text)
+
+    assert len(single) > 3
+    assert [without_number(text) for text in stitched] == [without_number(text) for text in single]
+    # Numbers are stamped once per page, in order, after stitching
+    numbers = [[f"Page {n}"] for n in range(1, len(single) + 1)]
+    assert [re.findall(r"Page \d+", text) for text in stitched] == numbers
+    assert [re.findall(r"Page \d+", text) for text in single] == numbers
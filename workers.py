@@ -0,0 +1,24 @@
+"""Process pools shared by every session of the server process."""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def worker_count(env_var):
+    """Worker count configured in ``env_var`` (0 or unset = one per CPU)."""
+    return int(os.environ.get(env_var, "0")) or os.cpu_count() or 1
+
+
+def process_pool(name, max_workers):
+    """The pool called ``name``, created on first use."""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            # fork: spawn/forkserver would re-run the Streamlit script, which is installed as __main__
+            context = multiprocessing.get_context('fork') if os.name == 'posix' else None
+            pool = _pools[name] = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        return pool